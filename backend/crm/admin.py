@@ -5,7 +5,7 @@ from django.urls import path, reverse
 from django.http import HttpResponseRedirect
 from django.shortcuts import render, redirect
 from django.utils.translation import gettext_lazy as _
-from .models import Contact, Order, Product, OAuth2Token, TokenRequestLog, SystemLog, Appointment, AppointmentWebhookLog
+from .models import Contact, Order, Product, OAuth2Token, TokenRequestLog, SystemLog, SyncJob, Appointment, AppointmentWebhookLog
 from .admin_site import crm_admin_site
 from .ghl_oauth import get_authorization_url
 from django.contrib import messages
@@ -498,10 +498,16 @@ class AppointmentAdmin(admin.ModelAdmin):
 class AppointmentWebhookLogAdmin(admin.ModelAdmin):
     list_display = ['source', 'status', 'processed', 'created_at']
     list_filter = ['source', 'status', 'processed']
-    readonly_fields = ['id', 'source', 'headers', 'payload', 'created_at']
+    readonly_fields = ['id', 'source', 'headers', 'payload', 'created_at', 'locked_at']
     search_fields = ['source', 'error_message']
     date_hierarchy = 'created_at'
 
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ['job_type', 'status', 'attempts', 'locked_by', 'created_at', 'finished_at']
+    list_filter = ['job_type', 'status']
+    readonly_fields = ['id', 'payload', 'result', 'error_message', 'locked_by', 'locked_at', 'created_at', 'finished_at']
+    date_hierarchy = 'created_at'
+
 # Register models with the admin site
 admin.site.register(Contact, ContactAdmin)
 admin.site.register(Order, OrderAdmin)
@@ -511,6 +517,7 @@ admin.site.register(TokenRequestLog, TokenRequestLogAdmin)
 admin.site.register(SystemLog, SystemLogAdmin)
 admin.site.register(Appointment, AppointmentAdmin)
 admin.site.register(AppointmentWebhookLog, AppointmentWebhookLogAdmin)
+admin.site.register(SyncJob, SyncJobAdmin)
 
 # Register with custom admin site
 crm_admin_site.register(Contact, ContactAdmin)
@@ -521,3 +528,4 @@ crm_admin_site.register(TokenRequestLog, TokenRequestLogAdmin)
 crm_admin_site.register(SystemLog, SystemLogAdmin)
 crm_admin_site.register(Appointment, AppointmentAdmin)
 crm_admin_site.register(AppointmentWebhookLog, AppointmentWebhookLogAdmin)
+crm_admin_site.register(SyncJob, SyncJobAdmin)
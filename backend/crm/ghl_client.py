@@ -0,0 +1,77 @@
+import logging
+import requests
+from django.conf import settings
+from .ratelimit import RateLimiterRegistry, TokenBucket
+from .retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+GHL_API_HOST = 'services.leadconnectorhq.com'
+
+# Shared by every GoHighLevel call in this process so the circuit breaker
+# and retry budget see all traffic to the API
+ghl_retry_policy = RetryPolicy(**getattr(settings, 'GOHIGHLEVEL_RETRY', {}))
+
+# One token bucket per location; GoHighLevel enforces its burst quota per location
+ghl_rate_limiters = RateLimiterRegistry(
+    lambda: TokenBucket(settings.GOHIGHLEVEL_RATE_LIMIT['BURST'], settings.GOHIGHLEVEL_RATE_LIMIT['INTERVAL'])
+)
+
+def _header_number(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def observe_rate_limit(limiter, response):
+    """
+    Feed GoHighLevel's rate-limit headers from a response into a limiter.
+
+    GoHighLevel reports the burst quota as X-RateLimit-Max,
+    X-RateLimit-Remaining and X-RateLimit-Interval-Milliseconds, and the
+    daily quota as X-RateLimit-Limit-Daily / X-RateLimit-Daily-Remaining.
+    """
+    headers = response.headers
+    interval_ms = _header_number(headers, 'X-RateLimit-Interval-Milliseconds')
+    remaining = _header_number(headers, 'X-RateLimit-Remaining')
+    limiter.update(
+        limit=_header_number(headers, 'X-RateLimit-Max'),
+        remaining=remaining,
+        interval=interval_ms / 1000 if interval_ms else None,
+    )
+    if response.status_code == 429 and remaining is None:
+        # Throttled without quota headers: back off for a whole window
+        limiter.pause(limiter.interval)
+    daily_remaining = _header_number(headers, 'X-RateLimit-Daily-Remaining')
+    if daily_remaining is not None and daily_remaining < settings.GOHIGHLEVEL_RATE_LIMIT['DAILY_WARNING']:
+        logger.warning(f"GoHighLevel daily quota nearly exhausted: {daily_remaining:.0f} requests left")
+
+def ghl_request(location_id, method, url, retry=True, **kwargs):
+    """
+    Send a GoHighLevel API request through the location's rate limiter.
+
+    Every attempt waits for a token from the location's bucket, and the
+    response headers adjust the bucket to the quota GoHighLevel reports.
+
+    Args:
+        location_id (str): Location whose quota the request counts against
+        method (str): HTTP method
+        url (str): Request URL
+        retry (bool): Retry through ghl_retry_policy (disable for non-idempotent calls)
+        **kwargs: Passed to requests.request (timeout defaults to 30s)
+
+    Returns:
+        requests.Response: The final response
+    """
+    limiter = ghl_rate_limiters.get(location_id)
+    kwargs.setdefault('timeout', 30)
+
+    def send():
+        limiter.acquire()
+        response = requests.request(method, url, **kwargs)
+        observe_rate_limit(limiter, response)
+        return response
+
+    if not retry:
+        return send()
+    return ghl_retry_policy.request(GHL_API_HOST, send)
@@ -2,19 +2,32 @@ import os
 import json
 import logging
 import requests
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.db import connection
+from django.db.models import Case, CharField, Q, Value, When
+from django.db.models.functions import Coalesce, Concat, NullIf
 from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse
+from .ghl_client import ghl_request
 from .models import OAuth2Token, TokenRequestLog
 from .utils import log_system_event
 
 logger = logging.getLogger(__name__)
 
+# Per-process token cache: location_id -> (token, monotonic time it was cached)
+_token_cache = {}
+# One lock per location so concurrent callers wait for a single refresh
+_refresh_locks = {}
+_refresh_locks_guard = threading.Lock()
+
 def get_token_url():
     return "https://services.leadconnectorhq.com/oauth/token"
 
@@ -97,25 +110,11 @@ def oauth_callback(request):
             }
         )
         
-        # Fetch location name if not already set
-        if created or not token.location_name:
-            try:
-                # Make a request to the GoHighLevel API to get location details
-                location_url = f"https://services.leadconnectorhq.com/locations/{location_id}"
-                headers = {
-                    'Authorization': f"Bearer {token.access_token}",
-                    'Version': '2021-07-28'
-                }
-                location_response = requests.get(location_url, headers=headers)
-                if location_response.status_code == 200:
-                    location_data = location_response.json()
-                    token.location_name = location_data.get('name', f"Location {location_id}")
-                    token.save()
-                    logger.info(f"Updated location name to: {token.location_name}")
-                else:
-                    logger.warning(f"Failed to fetch location name: {location_response.status_code}")
-            except Exception as e:
-                logger.error(f"Error fetching location name: {str(e)}")
+        # Location name, timezone etc. are fetched once here; the token refresher keeps them current
+        if created or not token.location_synced_at:
+            refresh_location_metadata(token)
+        
+        invalidate_cached_token(location_id)
         
         log.token = token
         log.status = 'success'
@@ -183,7 +182,8 @@ def refresh_token(token):
         
         try:
             logger.info(f"Sending refresh request to: {token_url}")
-            response = requests.post(token_url, data=payload)
+            # Not retried: a replayed refresh grant would use an already-rotated refresh token
+            response = ghl_request(token.location_id, 'POST', token_url, retry=False, data=payload)
             logger.info(f"Received response with status code: {response.status_code}")
             
             try:
@@ -209,26 +209,8 @@ def refresh_token(token):
             token.refresh_token = response_data['refresh_token']
             token.expires_at = expires_at
             
-            # Fetch location name if not already set
-            if not token.location_name:
-                try:
-                    # Make a request to the GoHighLevel API to get location details
-                    location_url = f"https://services.leadconnectorhq.com/locations/{token.location_id}"
-                    headers = {
-                        'Authorization': f"Bearer {token.access_token}",
-                        'Version': '2021-07-28'
-                    }
-                    location_response = requests.get(location_url, headers=headers)
-                    if location_response.status_code == 200:
-                        location_data = location_response.json()
-                        token.location_name = location_data.get('name', f"Location {token.location_id}")
-                        logger.info(f"Updated location name to: {token.location_name}")
-                    else:
-                        logger.warning(f"Failed to fetch location name: {location_response.status_code}")
-                except Exception as e:
-                    logger.error(f"Error fetching location name: {str(e)}")
-            
             token.save()
+            invalidate_cached_token(token.location_id)
             
             log.status = 'success'
             log.response_data = {
@@ -278,20 +260,279 @@ def refresh_token(token):
         logger.exception("Exception during token refresh")
         return token  # Return the expired token
 
+def _location_lock(location_id):
+    with _refresh_locks_guard:
+        return _refresh_locks.setdefault(location_id, threading.Lock())
+
+def _cached_token(location_id):
+    """The cached token for a location if it is still fresh and not about to expire."""
+    entry = _token_cache.get(location_id)
+    if entry is None:
+        return None
+    token, cached_at = entry
+    if token.is_expired or time.monotonic() - cached_at >= settings.GOHIGHLEVEL_TOKEN_CACHE['TTL']:
+        return None
+    return token
+
+def invalidate_cached_token(location_id):
+    """Drop a location's cached token so the next caller reloads it."""
+    _token_cache.pop(location_id, None)
+
 def get_valid_token(location_id):
     """
     Get a valid (non-expired) token for the given location
+    
+    Tokens are cached in this process until they are about to expire (or
+    for GOHIGHLEVEL_TOKEN_CACHE['TTL'] seconds, so refreshes made by other
+    processes are picked up). Refreshing is single-flight: callers in this
+    process queue on a per-location lock, other processes on a refresh
+    claim stored on the token row, and whoever gets there first refreshes
+    while the rest reuse its result.
     """
-    try:
-        token = OAuth2Token.objects.get(location_id=location_id)
+    token = _cached_token(location_id)
+    if token is not None:
+        return token
+    
+    with _location_lock(location_id):
+        # Another thread may have loaded or refreshed it while we waited
+        token = _cached_token(location_id)
+        if token is not None:
+            return token
+        
+        try:
+            token = OAuth2Token.objects.get(location_id=location_id)
+        except OAuth2Token.DoesNotExist:
+            logger.error(f"No token found for location {location_id}")
+            return None
         
         if token.is_expired:
-            token = refresh_token(token)
-            
+            token, _ = _refresh_if_due(location_id)
+        
+        # A failed refresh returns the expired token; don't cache that
+        if token is not None and not token.is_expired:
+            _token_cache[location_id] = (token, time.monotonic())
         return token
-    except OAuth2Token.DoesNotExist:
-        logger.error(f"No token found for location {location_id}")
-        return None
+
+def _wait_for_refresh(token, timeout):
+    """
+    Wait for another process to finish refreshing a token.
+    
+    Returns:
+        OAuth2Token: The token as that process left it, or as it stands after timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        current = OAuth2Token.objects.filter(pk=token.pk).first()
+        if (current is None or current.refresh_claimed_at is None
+                or current.expires_at != token.expires_at or time.monotonic() >= deadline):
+            return current
+        time.sleep(0.5)
+
+def _refresh_if_due(location_id, due_before=None):
+    """
+    Refresh a location's token if it is still due, unless another process is.
+    
+    The refresh is claimed with a conditional UPDATE on the token row,
+    which is atomic on every database including SQLite, so only one
+    process sends the refresh grant. The others wait for the claim to be
+    released and re-read the token it produced. A claim older than
+    TOKEN_REFRESH['CLAIM_TIMEOUT'] is assumed abandoned and can be taken over.
+    
+    The caller must hold the location's in-process lock.
+    
+    Returns:
+        tuple: (token, refreshed), token None if the location has no token
+    """
+    token = OAuth2Token.objects.filter(location_id=location_id).first()
+    if token is None:
+        return None, False
+    if not (token.is_expired or (due_before and token.expires_at <= due_before)):
+        return token, False
+    
+    claim_timeout = settings.TOKEN_REFRESH['CLAIM_TIMEOUT']
+    now = timezone.now()
+    claimed = OAuth2Token.objects.filter(pk=token.pk, expires_at=token.expires_at).filter(
+        Q(refresh_claimed_at__isnull=True) | Q(refresh_claimed_at__lt=now - timedelta(seconds=claim_timeout))
+    ).update(refresh_claimed_at=now)
+    if not claimed:
+        # Another process refreshed it already or is refreshing it now
+        logger.info(f"Token for location {location_id} is being refreshed elsewhere, waiting for it")
+        return _wait_for_refresh(token, claim_timeout), False
+    
+    token.refresh_claimed_at = now
+    old_expires_at = token.expires_at
+    try:
+        token = refresh_token(token)
+    finally:
+        OAuth2Token.objects.filter(pk=token.pk, refresh_claimed_at=now).update(refresh_claimed_at=None)
+        token.refresh_claimed_at = None
+    # refresh_token returns the unchanged token when the refresh fails
+    return token, token.expires_at != old_expires_at
+
+def refresh_location_token(location_id, due_before=None):
+    """
+    Refresh a location's token if it is expired or expires before due_before.
+    
+    Single-flight like get_valid_token: concurrent callers wait for the
+    refresh in progress and then find the token no longer due.
+    
+    Returns:
+        tuple: (token, refreshed), token None if the location has no token
+    """
+    with _location_lock(location_id):
+        return _refresh_if_due(location_id, due_before)
+
+def refresh_due_tokens(within, max_workers=None):
+    """
+    Refresh every token that expires within the given time, concurrently.
+    
+    Args:
+        within (timedelta): Refresh tokens expiring before now + within (expired ones included)
+        max_workers (int): Refreshes run at once (defaults to TOKEN_REFRESH['CONCURRENCY'])
+    
+    Returns:
+        list: dicts with location_id, refreshed, old_expires_at, expires_at and error
+    """
+    due_before = timezone.now() + within
+    due = list(OAuth2Token.objects.filter(expires_at__lt=due_before).values_list('location_id', 'expires_at'))
+    if not due:
+        return []
+    
+    def refresh(item):
+        location_id, old_expires_at = item
+        result = {'location_id': location_id, 'refreshed': False, 'old_expires_at': old_expires_at,
+                  'expires_at': old_expires_at, 'error': None}
+        try:
+            token, refreshed = refresh_location_token(location_id, due_before)
+            result['refreshed'] = refreshed
+            if token is not None:
+                result['expires_at'] = token.expires_at
+                # Refreshed by another worker while this one waited
+                if not refreshed and token.expires_at >= due_before:
+                    result['refreshed'] = True
+            if not result['refreshed']:
+                result['error'] = 'Refresh failed, see the token request log'
+        except Exception as e:
+            logger.exception(f"Error refreshing token for location {location_id}: {str(e)}")
+            result['error'] = str(e)
+        finally:
+            connection.close()
+        return result
+    
+    workers = min(max_workers or settings.TOKEN_REFRESH['CONCURRENCY'], len(due))
+    logger.info(f"Refreshing {len(due)} GoHighLevel tokens, {workers} at a time")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='token-refresh') as executor:
+        return list(executor.map(refresh, due))
+
+def refresh_location_metadata(token):
+    """
+    Fetch a location's details from GoHighLevel and cache them on its token.
+    
+    Stores the name, timezone and full location payload. Only the metadata
+    columns are written, so a token refreshed concurrently is not overwritten.
+    
+    Args:
+        token (OAuth2Token): Token of the location, used to authorize the request
+    
+    Returns:
+        bool: Whether the metadata was updated
+    """
+    location_url = f"https://services.leadconnectorhq.com/locations/{token.location_id}"
+    headers = {
+        'Authorization': f"Bearer {token.access_token}",
+        'Version': '2021-07-28'
+    }
+    try:
+        response = ghl_request(token.location_id, 'GET', location_url, headers=headers)
+        if response.status_code != 200:
+            logger.warning(f"Failed to fetch location {token.location_id}: {response.status_code}")
+            return False
+        location_data = response.json()
+    except Exception as e:
+        logger.error(f"Error fetching location {token.location_id}: {str(e)}")
+        return False
+    
+    # The v2 API nests the details under 'location'
+    location = location_data.get('location', location_data)
+    metadata = {
+        'location_name': location.get('name') or token.location_name or f"Location {token.location_id}",
+        'location_timezone': location.get('timezone') or '',
+        'location_data': location,
+        'location_synced_at': timezone.now(),
+    }
+    OAuth2Token.objects.filter(pk=token.pk).update(**metadata)
+    for field, value in metadata.items():
+        setattr(token, field, value)
+    logger.info(f"Updated metadata for location {token.location_id} ({token.location_name})")
+    return True
+
+def refresh_stale_location_metadata(max_age=None, max_workers=None):
+    """
+    Refresh cached location metadata that is missing or older than max_age.
+    
+    Args:
+        max_age (timedelta): Defaults to GOHIGHLEVEL_LOCATION_METADATA['TTL'] seconds
+        max_workers (int): Locations fetched at once (defaults to TOKEN_REFRESH['CONCURRENCY'])
+    
+    Returns:
+        dict: location_id -> whether its metadata was updated
+    """
+    if max_age is None:
+        max_age = timedelta(seconds=settings.GOHIGHLEVEL_LOCATION_METADATA['TTL'])
+    stale = list(OAuth2Token.objects.filter(
+        Q(location_synced_at__isnull=True) | Q(location_synced_at__lt=timezone.now() - max_age)
+    ).values_list('location_id', flat=True))
+    if not stale:
+        return {}
+    
+    def refresh(location_id):
+        try:
+            token = get_valid_token(location_id)
+            return location_id, token is not None and refresh_location_metadata(token)
+        finally:
+            connection.close()
+    
+    workers = min(max_workers or settings.TOKEN_REFRESH['CONCURRENCY'], len(stale))
+    logger.info(f"Refreshing metadata for {len(stale)} GoHighLevel locations")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='location-metadata') as executor:
+        return dict(executor.map(refresh, stale))
+
+# Tokens closer than this to expiry are shown as "Expiring Soon"
+TOKEN_EXPIRING_SOON = timedelta(hours=1)
+
+def token_status_summaries():
+    """
+    Status rows for every OAuth token, as shown on the dashboards.
+    
+    Status and display name are computed by the database in a single
+    query; nothing here calls GoHighLevel.
+    
+    Returns:
+        list: dicts with id, location_id, location_name, location_timezone,
+            expires_at, created_at, updated_at, status and is_expired
+    """
+    now = timezone.now()
+    rows = OAuth2Token.objects.annotate(
+        display_name=Coalesce(
+            NullIf('location_name', Value('')),
+            Concat(Value('Location '), 'location_id'),
+            output_field=CharField(),
+        ),
+        status=Case(
+            # Same cut-off as OAuth2Token.is_expired
+            When(expires_at__lte=now + OAuth2Token.EXPIRY_BUFFER, then=Value('Expired')),
+            When(expires_at__lt=now + TOKEN_EXPIRING_SOON, then=Value('Expiring Soon')),
+            default=Value('Valid'),
+            output_field=CharField(),
+        ),
+    ).order_by('-updated_at').values(
+        'id', 'location_id', 'display_name', 'location_timezone',
+        'expires_at', 'created_at', 'updated_at', 'status',
+    )
+    return [
+        dict(row, location_name=row.pop('display_name'), is_expired=row['status'] == 'Expired')
+        for row in rows
+    ]
 
 def get_authorization_url(location_id):
     """
@@ -452,25 +693,11 @@ def location_submit_view(request):
             }
         )
         
-        # Fetch location name if not already set
-        if created or not token.location_name:
-            try:
-                # Make a request to the GoHighLevel API to get location details
-                location_url = f"https://services.leadconnectorhq.com/locations/{location_id}"
-                headers = {
-                    'Authorization': f"Bearer {token.access_token}",
-                    'Version': '2021-07-28'
-                }
-                location_response = requests.get(location_url, headers=headers)
-                if location_response.status_code == 200:
-                    location_data = location_response.json()
-                    token.location_name = location_data.get('name', f"Location {location_id}")
-                    token.save()
-                    logger.info(f"Updated location name to: {token.location_name}")
-                else:
-                    logger.warning(f"Failed to fetch location name: {location_response.status_code}")
-            except Exception as e:
-                logger.error(f"Error fetching location name: {str(e)}")
+        # Location name, timezone etc. are fetched once here; the token refresher keeps them current
+        if created or not token.location_synced_at:
+            refresh_location_metadata(token)
+        
+        invalidate_cached_token(location_id)
         
         log.token = token
         log.status = 'success'
@@ -9,7 +9,8 @@ import json
 import logging
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
-from .models import Contact, Appointment, AppointmentWebhookLog
+from .models import Appointment, AppointmentWebhookLog
+from .identity import GHL_MATCH_ORDER, get_identity_index
 
 logger = logging.getLogger(__name__)
 
@@ -68,20 +69,14 @@ def process_ghl_appointment_webhook(webhook_log):
             'raw_data': data
         }
         
-        # Find or create contact - following the priority order from the memory:
+        # Find the contact - following the priority order from the memory:
         # ID → Phone → Email
-        contact = None
-        if contact_info['ghl_contact_id']:
-            # Try to find by GoHighLevel ID first (priority 1)
-            contact = Contact.objects.filter(ghl_contact_id=contact_info['ghl_contact_id']).first()
-        
-        if not contact and contact_info['phone']:
-            # Try to find by phone (priority 2)
-            contact = Contact.objects.filter(phone=contact_info['phone']).first()
-        
-        if not contact and contact_info['email']:
-            # Try to find by email (priority 3)
-            contact = Contact.objects.filter(email=contact_info['email']).first()
+        contact = get_identity_index().find(
+            order=GHL_MATCH_ORDER,
+            ghl_id=contact_info['ghl_contact_id'],
+            phone=contact_info['phone'],
+            email=contact_info['email'],
+        )
         
         if contact:
             logger.info(f"Found existing contact: {contact}")
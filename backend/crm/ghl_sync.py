@@ -1,12 +1,20 @@
 import requests
 import json
 import logging
+import queue
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
-from .models import Contact, OAuth2Token
+from .models import Contact, OAuth2Token, SyncState
 from .ghl_oauth import get_valid_token
-from .utils import log_system_event
+from .ghl_client import ghl_request
+from .identity import get_identity_index, normalize_phone
+from .progress import ProgressTracker, ghl_sync_key
+from .utils import log_system_event, payload_fingerprint, sqlite_write_lock
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +28,17 @@ def get_ghl_headers(token):
         'Content-Type': 'application/json'
     }
 
-def search_ghl_contacts(location_id, search_params=None, page=1, page_limit=100):
+def search_ghl_contacts(location_id, search_params=None, page=1, page_limit=100, search_after=None):
     """
     Search for contacts in GoHighLevel
     
     Args:
         location_id (str): The GoHighLevel location ID
         search_params (dict): Optional search parameters
-        page (int): Page number (starting at 1)
+        page (int): Page number (starting at 1); ignored when search_after is given
         page_limit (int): Number of results per page
+        search_after (list): Cursor from the last contact of the previous page
+            (its 'searchAfter' value); requires a sort in search_params
         
     Returns:
         dict: The API response
@@ -43,15 +53,18 @@ def search_ghl_contacts(location_id, search_params=None, page=1, page_limit=100)
     
     payload = {
         "locationId": location_id,
-        "page": page,
         "pageLimit": page_limit
     }
+    if search_after is not None:
+        payload["searchAfter"] = search_after
+    else:
+        payload["page"] = page
     
     if search_params:
         payload.update(search_params)
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = ghl_request(location_id, 'POST', url, headers=headers, json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -78,23 +91,37 @@ def get_ghl_contact(location_id, contact_id):
     headers = get_ghl_headers(token)
     
     try:
-        response = requests.get(url, headers=headers)
+        response = ghl_request(location_id, 'GET', url, headers=headers)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         logger.error(f"Error getting GHL contact: {str(e)}")
         return None
 
-def sync_ghl_contact(location_id, ghl_contact_data):
+def ghl_identities(ghl_contact_data):
+    """The identity-index keys of a GoHighLevel record."""
+    return {
+        'ghl_id': ghl_contact_data.get('id'),
+        'phone': ghl_contact_data.get('phone'),
+        'email': ghl_contact_data.get('email'),
+    }
+
+def match_ghl_contact(index, ghl_contact_data):
+    """Contact id matching a GoHighLevel record by ID, then phone, then email."""
+    return index.match(**ghl_identities(ghl_contact_data))
+
+def sync_ghl_contact(location_id, ghl_contact_data, index=None, prefetched=None):
     """
     Sync a GoHighLevel contact to the local database
     
     Args:
         location_id (str): The GoHighLevel location ID
         ghl_contact_data (dict): The contact data from GoHighLevel
+        index (ContactIdentityIndex): Index to match against (defaults to the shared one)
+        prefetched (dict): Contacts already loaded for this batch, keyed by id
         
     Returns:
-        Contact: The created or updated Contact object
+        Contact: The created or updated Contact object, or None if it could not be synced
     """
     try:
         ghl_id = ghl_contact_data.get('id')
@@ -102,33 +129,36 @@ def sync_ghl_contact(location_id, ghl_contact_data):
             logger.error("Contact data missing ID")
             return None
         
-        # Try to find an existing contact by GHL ID
-        contact = Contact.objects.filter(ghl_contact_id=ghl_id).first()
-        
-        # If not found by GHL ID, try by phone or email
-        if not contact:
-            phone = ghl_contact_data.get('phone')
-            email = ghl_contact_data.get('email')
-            
-            if phone:
-                contact = Contact.objects.filter(phone=phone).first()
-            
-            if not contact and email:
-                contact = Contact.objects.filter(email=email).first()
+        # Find an existing contact by GHL ID, then phone, then email
+        if index is None:
+            index = get_identity_index()
+            index.load_missing([ghl_identities(ghl_contact_data)])
+        contact_id = match_ghl_contact(index, ghl_contact_data)
+        contact = None
+        if contact_id:
+            if prefetched and contact_id in prefetched:
+                contact = prefetched[contact_id]
+            else:
+                contact = index.fetch([contact_id]).get(contact_id)
         
         # Extract contact data
         contact_data = {
             'first_name': ghl_contact_data.get('firstName', ''),
             'last_name': ghl_contact_data.get('lastName', ''),
             'phone': ghl_contact_data.get('phone') or '',  # Use empty string if phone is None
-            'normalized_phone': ghl_contact_data.get('phone') or '',  # Also set normalized_phone
+            'normalized_phone': normalize_phone(ghl_contact_data.get('phone')),
             'ghl_contact_id': ghl_id,
             'ghl_data': ghl_contact_data,
+            'ghl_data_hash': payload_fingerprint(ghl_contact_data),
             'ghl_last_sync': timezone.now(),
         }
         
-        # Print contact data for debugging
-        print(f"Contact data: {contact_data}")
+        # Nothing changed upstream since the last sync: skip the write entirely
+        if contact and contact.ghl_contact_id == ghl_id and contact.ghl_data_hash == contact_data['ghl_data_hash']:
+            logger.debug(f"GHL contact {ghl_id} unchanged since last sync, skipping")
+            return contact
+        
+        logger.debug(f"Contact data: {contact_data}")
         
         # Only add email if it exists
         if ghl_contact_data.get('email'):
@@ -142,58 +172,194 @@ def sync_ghl_contact(location_id, ghl_contact_data):
         if 'customFields' in ghl_contact_data:
             contact_data['ghl_custom_fields'] = ghl_contact_data.get('customFields', [])
         
-        # If we found an existing contact, update it
-        if contact:
-            # Set primary source to GHL if it was previously CRM only
-            if contact.primary_source == 'crm':
+        # Savepoint, so a failed write doesn't poison a surrounding page transaction
+        with transaction.atomic():
+            # If we found an existing contact, update it
+            if contact:
+                # Set primary source to GHL if it was previously CRM only
+                if contact.primary_source == 'crm':
+                    contact_data['primary_source'] = 'ghl'
+                    
+                # Update the contact with the new data
+                for key, value in contact_data.items():
+                    setattr(contact, key, value)
+                contact.save()
+                logger.info(f"Updated contact: {contact}")
+            else:
+                # Create a new contact
                 contact_data['primary_source'] = 'ghl'
-                
-            # Update the contact with the new data
-            for key, value in contact_data.items():
-                setattr(contact, key, value)
-            contact.save()
-            logger.info(f"Updated contact: {contact}")
-        else:
-            # Create a new contact
-            contact_data['primary_source'] = 'ghl'
-            try:
                 contact = Contact.objects.create(**contact_data)
                 logger.info(f"Created new contact: {contact}")
-            except Exception as create_error:
-                print(f"Error creating contact: {str(create_error)}")
-                print(f"Contact data: {contact_data}")
-                raise
         
+        index.add(contact)
         return contact
     except Exception as e:
-        import traceback
-        logger.error(f"Error syncing contact: {str(e)}")
-        logger.error(f"Full traceback: {traceback.format_exc()}")
-        print(f"Error syncing contact: {str(e)}")
-        print(f"Full traceback: {traceback.format_exc()}")
-        print(f"Contact data: {ghl_contact_data}")
+        logger.exception(f"Error syncing GHL contact {ghl_contact_data.get('id')}: {str(e)}")
+        logger.debug(f"Contact data: {ghl_contact_data}")
         return None
 
+class StageStats:
+    """Throughput counters for one stage of the sync pipeline."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0  # Seconds spent doing the stage's work
+        self.blocked = 0.0  # Seconds spent waiting on the neighbouring stage
+
+    def as_dict(self):
+        return {
+            'items': self.items,
+            'busy_seconds': round(self.busy, 2),
+            'blocked_seconds': round(self.blocked, 2),
+            'per_second': round(self.items / self.busy, 1) if self.busy else None,
+        }
+
+def fetch_ghl_contacts_page(location_id, search_params, page, page_limit, search_after=None):
+    """
+    Fetch one page of contacts.
+    
+    Requests are already retried by ghl_request's RetryPolicy, so a page
+    that still fails is not retried again here.
+    
+    Returns:
+        dict: The search response, or None if the request failed
+    """
+    result = search_ghl_contacts(location_id, search_params=search_params, page=page,
+                                 page_limit=page_limit, search_after=search_after)
+    if result and 'contacts' in result:
+        return result
+    return None
+
+def next_ghl_cursor(contacts):
+    """The searchAfter cursor that continues after the last contact of a page."""
+    return contacts[-1].get('searchAfter') if contacts else None
+
+def prefetch_ghl_contact_pages(location_id, search_params, start_page, page_limit, max_pages=None,
+                               prefetch=None, stats=None, use_cursor=False, search_after=None):
+    """
+    Yield (page, result, cursor) for successive contact pages, fetching ahead on a background thread.
+    
+    With use_cursor the pages are walked with searchAfter, starting after
+    `search_after` (or from the beginning), and cursor is the value that
+    continues after the page; page is then only a counter. Otherwise pages
+    are requested by number and cursor is None.
+    
+    The fetcher stays at most `prefetch` pages ahead of the consumer (the
+    bounded queue blocks it), so the next pages download while the
+    current one is being written. result is None for a page that could not
+    be fetched; iteration stops after it. Closing the generator stops the
+    fetcher.
+    """
+    prefetch = prefetch or settings.GOHIGHLEVEL_SYNC['PREFETCH_PAGES']
+    stats = stats or StageStats('fetch')
+    pages = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+    
+    def put(item):
+        # Block while the consumer is behind, but give up if it went away
+        started = time.monotonic()
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        stats.blocked += time.monotonic() - started
+    
+    def fetch():
+        page = start_page
+        cursor = search_after
+        try:
+            while not stop.is_set():
+                if max_pages and (page - start_page + 1) > max_pages:
+                    logger.info(f"Reached maximum page limit of {max_pages}")
+                    break
+                logger.info(f"Fetching GHL contacts page {page}")
+                started = time.monotonic()
+                result = fetch_ghl_contacts_page(location_id, search_params, page, page_limit,
+                                                 search_after=cursor if use_cursor else None)
+                stats.busy += time.monotonic() - started
+                contacts = result.get('contacts') if result else None
+                if use_cursor:
+                    cursor = next_ghl_cursor(contacts)
+                put((page, result, cursor if use_cursor else None))
+                if not contacts:
+                    break
+                stats.items += len(contacts)
+                if use_cursor:
+                    # A short page or a contact without a cursor is the end of the list
+                    if len(contacts) < page_limit or cursor is None:
+                        break
+                elif page * page_limit >= result.get('total', 0):
+                    break
+                page += 1
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+            connection.close()
+    
+    fetcher = threading.Thread(target=fetch, name=f'ghl-fetch-{location_id}', daemon=True)
+    fetcher.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            if item[1] is None:
+                return
+    finally:
+        stop.set()
+        fetcher.join(timeout=5)
+
 def sync_all_ghl_contacts(location_id, page_limit=100, start_page=1, max_pages=None, 
-                          track_progress=True, sync_modified_after=None):
+                          track_progress=True, sync_modified_after=None, progress=None,
+                          use_cursor=None, search_after=None, on_page=None):
     """
     Sync all contacts from GoHighLevel to the local database
     
+    Runs as a two-stage pipeline: a background thread fetches pages (paced
+    by the location's GoHighLevel rate limiter) into a bounded queue while this thread
+    matches and writes the previous page, so network and database time
+    overlap.
+    
+    By default pages are walked with searchAfter cursors over a stable sort
+    (date added, or date updated for incremental syncs), which costs the
+    same per page at any depth and doesn't skip or repeat contacts that
+    move while the sync runs.
+    
     Args:
         location_id (str): The GoHighLevel location ID
         page_limit (int): Number of results per page
         start_page (int): Page to start syncing from (for resuming interrupted syncs)
         max_pages (int): Maximum number of pages to process (None for all pages)
-        track_progress (bool): Whether to create system logs for tracking progress
+        track_progress (bool): Whether to create system logs for the start and end of the sync
         sync_modified_after (datetime): Only sync contacts modified after this date
+        progress (ProgressTracker): Optional shared progress to report to; its stop flag is checked every page
+        use_cursor (bool): Paginate with searchAfter cursors (defaults to GOHIGHLEVEL_SYNC['CURSOR_PAGINATION'])
+        search_after (list): Cursor to resume after (implies use_cursor); start_page is then only a counter
+        on_page (callable): Optional checkpoint callback receiving (page, cursor, success_count,
+            error_count, last_record_fingerprint); it runs inside the page's transaction, so
+            its writes commit or roll back with the page's contacts
         
     Returns:
         tuple: (success_count, error_count, last_page_processed)
     """
-    page = start_page
-    has_more = True
+    if use_cursor is None:
+        use_cursor = search_after is not None or settings.GOHIGHLEVEL_SYNC['CURSOR_PAGINATION']
+    last_page_processed = start_page - 1
     success_count = 0
     error_count = 0
+    fetch_stats = StageStats('fetch')
+    write_stats = StageStats('write')
+    
+    def stage_counters():
+        return {'fetch': fetch_stats.as_dict(), 'write': write_stats.as_dict()}
     
     # Create a sync session log
     if track_progress:
@@ -207,6 +373,7 @@ def sync_all_ghl_contacts(location_id, page_limit=100, start_page=1, max_pages=N
                 'location_id': location_id,
                 'start_page': start_page,
                 'max_pages': max_pages,
+                'search_after': search_after,
                 'sync_modified_after': sync_modified_after.isoformat() if sync_modified_after else None
             }
         )
@@ -220,40 +387,41 @@ def sync_all_ghl_contacts(location_id, page_limit=100, start_page=1, max_pages=N
             'value': sync_modified_after.isoformat()
         }]
         
-        # Sort by update date to get newest first
+        # Oldest change first, so contacts updated during the sync move
+        # ahead of the cursor instead of being skipped
         search_params['sort'] = [{
             'field': 'dateUpdated',
-            'direction': 'desc'
+            'direction': 'asc' if use_cursor else 'desc'
+        }]
+    elif use_cursor:
+        # Cursors need a stable order; new contacts are appended at the end
+        search_params['sort'] = [{
+            'field': 'dateAdded',
+            'direction': 'asc'
         }]
     
+    pages = prefetch_ghl_contact_pages(
+        location_id, search_params, start_page, page_limit, max_pages, stats=fetch_stats,
+        use_cursor=use_cursor, search_after=search_after
+    )
     try:
-        while has_more:
-            if max_pages and (page - start_page + 1) > max_pages:
-                logger.info(f"Reached maximum page limit of {max_pages}")
+        while True:
+            if progress and progress.should_stop():
+                logger.info(f"GHL contact sync stopped by user after page {last_page_processed}")
+                progress.finish('stopped', f'Sync stopped by user after page {last_page_processed}. Success: {success_count}, Errors: {error_count}')
+                return success_count, error_count, last_page_processed
+            
+            waited = time.monotonic()
+            item = next(pages, None)
+            write_stats.blocked += time.monotonic() - waited
+            if item is None:
                 break
-                
-            if track_progress and page % 5 == 0:  # Log progress every 5 pages
-                log_system_event(
-                    f"Syncing GHL contacts - processing page {page}",
-                    type='sync',
-                    status='in_progress',
-                    details={
-                        'sync_id': sync_id if track_progress else None,
-                        'page': page,
-                        'success_count': success_count,
-                        'error_count': error_count
-                    }
-                )
-                
-            logger.info(f"Fetching GHL contacts page {page}")
-            result = search_ghl_contacts(location_id, search_params=search_params, 
-                                        page=page, page_limit=page_limit)
+            page, result, cursor = item
             
-            if not result or 'contacts' not in result:
+            if result is None:
                 error_msg = f"Failed to get contacts for page {page}"
-                logger.error(error_msg)
+                logger.error(f"{error_msg}, giving up")
                 error_count += 1
-                
                 if track_progress:
                     log_system_event(
                         error_msg,
@@ -261,62 +429,54 @@ def sync_all_ghl_contacts(location_id, page_limit=100, start_page=1, max_pages=N
                         status='error',
                         details={
                             'sync_id': sync_id,
-                            'page': page,
-                            'response': result
+                            'page': page
                         }
                     )
-                
-                # Wait before retrying to avoid hitting rate limits
-                time.sleep(5)
-                
-                # Try up to 3 times before giving up on this page
-                retry_count = 0
-                while retry_count < 3 and (not result or 'contacts' not in result):
-                    retry_count += 1
-                    logger.info(f"Retrying page {page} (attempt {retry_count}/3)")
-                    time.sleep(5 * retry_count)  # Exponential backoff
-                    result = search_ghl_contacts(location_id, search_params=search_params, 
-                                               page=page, page_limit=page_limit)
-                
-                if not result or 'contacts' not in result:
-                    logger.error(f"Giving up on page {page} after 3 retries")
-                    break
+                # Not 'done': the remaining pages were never fetched, so the run must stay resumable
+                if progress:
+                    progress.finish('error', f'{error_msg}. Success: {success_count}, Errors: {error_count}')
+                return success_count, error_count, last_page_processed
             
             contacts = result.get('contacts', [])
-            
             if not contacts:
                 logger.info(f"No contacts found on page {page}")
-                has_more = False
-                continue
+                break
             
             logger.info(f"Processing {len(contacts)} contacts from page {page}")
-            
-            # Process contacts in smaller batches to avoid memory issues
-            batch_size = 20
-            for i in range(0, len(contacts), batch_size):
-                batch = contacts[i:i+batch_size]
-                for contact_data in batch:
-                    try:
-                        sync_ghl_contact(location_id, contact_data)
-                        success_count += 1
-                    except Exception as e:
-                        logger.exception(f"Error syncing contact: {str(e)}")
-                        error_count += 1
-                
-                # Small pause between batches to reduce database load
-                time.sleep(0.5)
-            
-            # Check if there are more pages
-            total_count = result.get('total', 0)
-            current_count = page * page_limit
-            has_more = current_count < total_count
+            started = time.monotonic()
+            page_success = 0
+            page_errors = 0
+            # Match the whole page in memory and load its contacts in one query
+            index = get_identity_index()
+            index.load_missing(ghl_identities(contact_data) for contact_data in contacts)
+            prefetched = index.fetch(match_ghl_contact(index, contact_data) for contact_data in contacts)
+            # The page's writes and its checkpoint commit together, so after a
+            # crash the database holds exactly the pages on_page has recorded
+            with sqlite_write_lock(), transaction.atomic():
+                for contact_data in contacts:
+                    # Failures are logged by sync_ghl_contact and come back as None
+                    if sync_ghl_contact(location_id, contact_data, index=index, prefetched=prefetched):
+                        page_success += 1
+                    else:
+                        page_errors += 1
+                if on_page:
+                    on_page(page, cursor, success_count + page_success, error_count + page_errors,
+                            payload_fingerprint(contacts[-1]))
+            success_count += page_success
+            error_count += page_errors
+            write_stats.busy += time.monotonic() - started
+            write_stats.items += len(contacts)
             
             # Save the last processed page in case we need to resume
             last_page_processed = page
-            page += 1
             
-            # Add a small delay between pages to avoid hitting rate limits
-            time.sleep(2)
+            if progress:
+                total_count = result.get('total', 0)
+                progress.update(
+                    message=f'Syncing GoHighLevel contacts - page {page}. Success: {success_count}, Errors: {error_count}',
+                    page=page, current=min(page * page_limit, total_count), total=total_count,
+                    success=success_count, errors=error_count, stages=stage_counters()
+                )
     
     except Exception as e:
         logger.exception(f"Unexpected error during GHL contact sync: {str(e)}")
@@ -327,12 +487,21 @@ def sync_all_ghl_contacts(location_id, page_limit=100, start_page=1, max_pages=N
                 status='error',
                 details={
                     'sync_id': sync_id,
-                    'last_page_processed': page - 1,
+                    'last_page_processed': last_page_processed,
                     'success_count': success_count,
                     'error_count': error_count
                 }
             )
-        return success_count, error_count, page - 1
+        if progress:
+            progress.finish('error', f'Sync interrupted: {str(e)}')
+        return success_count, error_count, last_page_processed
+    finally:
+        pages.close()
+    
+    logger.info(f"GHL contact sync pipeline stages: {stage_counters()}")
+    if progress:
+        progress.update(stages=stage_counters())
+        progress.finish('done', f'Completed GoHighLevel sync: {success_count} contacts synced, {error_count} errors')
     
     # Log completion
     if track_progress:
@@ -342,13 +511,14 @@ def sync_all_ghl_contacts(location_id, page_limit=100, start_page=1, max_pages=N
             status='success',
             details={
                 'sync_id': sync_id,
-                'total_pages': page - 1,
+                'total_pages': last_page_processed,
                 'success_count': success_count,
-                'error_count': error_count
+                'error_count': error_count,
+                'stages': stage_counters()
             }
         )
     
-    return success_count, error_count, page - 1
+    return success_count, error_count, last_page_processed
 
 def sync_updated_ghl_contacts(location_id):
     """
@@ -379,3 +549,169 @@ def sync_updated_ghl_contacts(location_id):
         location_id=location_id,
         sync_modified_after=sync_modified_after
     )
+
+class SyncCheckpoint:
+    """
+    on_page callback for sync_all_ghl_contacts that checkpoints a SyncState.
+
+    It runs inside each page's transaction, so the checkpoint is durable
+    exactly when the page's contacts are. Counts are cumulative across
+    runs: call begin_run() before each sync_all_ghl_contacts call so the
+    counts already recorded are carried forward.
+    """
+
+    def __init__(self, sync_state):
+        self.sync_state = sync_state
+        self.begin_run()
+
+    def begin_run(self):
+        self.base_success = self.sync_state.success_count
+        self.base_errors = self.sync_state.error_count
+
+    def __call__(self, page, cursor, success_count, error_count, last_record_fingerprint):
+        checkpoint = {
+            'last_page_processed': page,
+            'cursor': cursor,
+            'success_count': self.base_success + success_count,
+            'error_count': self.base_errors + error_count,
+            'last_record_fingerprint': last_record_fingerprint,
+        }
+        SyncState.objects.filter(id=self.sync_state.id).update(**checkpoint)
+        for field, value in checkpoint.items():
+            setattr(self.sync_state, field, value)
+
+    def complete(self, last_page):
+        self.sync_state.is_complete = True
+        self.sync_state.total_pages = last_page
+        self.sync_state.cursor = None
+        with sqlite_write_lock():
+            self.sync_state.save()
+
+def start_ghl_sync_state(location_id, resume=False, start_page=1):
+    """
+    Get the SyncState for a location's contact sync.
+
+    Args:
+        location_id (str): The GoHighLevel location ID
+        resume (bool): Continue an incomplete sync's checkpoint if there is one
+        start_page (int): Page a fresh sync starts from
+
+    Returns:
+        tuple: (SyncState, resumed)
+    """
+    if resume:
+        sync_state = SyncState.objects.filter(
+            sync_type='ghl_contacts',
+            location_id=location_id,
+            is_complete=False
+        ).first()
+        if sync_state:
+            sync_state.last_sync_time = timezone.now()
+            sync_state.save(update_fields=['last_sync_time'])
+            return sync_state, True
+
+    with sqlite_write_lock():
+        sync_state, created = SyncState.objects.update_or_create(
+            sync_type='ghl_contacts',
+            location_id=location_id,
+            defaults={
+                'last_sync_time': timezone.now(),
+                'is_complete': False,
+                'last_page_processed': start_page - 1,
+                'cursor': None,
+                'success_count': 0,
+                'error_count': 0,
+                'last_record_fingerprint': '',
+            }
+        )
+    return sync_state, False
+
+def sync_ghl_location(location_id, resume=False, progress=None, page_limit=100):
+    """
+    Run a full contact sync for one location, checkpointed in its SyncState.
+
+    Args:
+        location_id (str): The GoHighLevel location ID
+        resume (bool): Continue after the last checkpointed page of an incomplete sync
+        progress (ProgressTracker): Progress to report to (defaults to the location's own key)
+        page_limit (int): Number of results per page
+
+    Returns:
+        dict: status, message, success and errors (including pages done before a resume) and last_page
+    """
+    if progress is None:
+        progress = ProgressTracker(ghl_sync_key(location_id))
+        progress.start('Starting GoHighLevel sync')
+    sync_state, resumed = start_ghl_sync_state(location_id, resume)
+    if resumed:
+        logger.info(f"Resuming GHL contact sync for {location_id} after page {sync_state.last_page_processed}")
+    checkpoint = SyncCheckpoint(sync_state)
+    success_count, error_count, last_page = sync_all_ghl_contacts(
+        location_id,
+        page_limit=page_limit,
+        start_page=sync_state.last_page_processed + 1,
+        progress=progress,
+        search_after=sync_state.cursor,
+        on_page=checkpoint
+    )
+    # Stopped or failed syncs keep their checkpoint for the next resume; without
+    # max_pages a 'done' sync has walked the contact list to its end
+    if progress.status == 'done':
+        checkpoint.complete(last_page)
+    return {
+        'status': progress.status,
+        'message': progress.message,
+        'success': sync_state.success_count,
+        'errors': sync_state.error_count,
+        'last_page': last_page,
+    }
+
+def sync_ghl_locations(location_ids=None, max_workers=None, resume=False):
+    """
+    Sync contacts for several GoHighLevel locations concurrently.
+
+    Each location runs in its own worker thread with its own SyncState,
+    progress key and rate limiter, so total time is roughly that of the
+    largest location rather than the sum of all of them.
+
+    Args:
+        location_ids (list): Locations to sync (defaults to every connected location)
+        max_workers (int): Locations synced at once (defaults to GOHIGHLEVEL_SYNC['MAX_LOCATIONS'])
+        resume (bool): Continue each location's incomplete sync if it has one
+
+    Returns:
+        dict: location_id -> sync_ghl_location result, or status 'error' and the error message
+    """
+    if location_ids is None:
+        location_ids = list(
+            OAuth2Token.objects.exclude(location_id='').values_list('location_id', flat=True)
+        )
+    max_workers = max_workers or settings.GOHIGHLEVEL_SYNC['MAX_LOCATIONS']
+    results = {}
+    if not location_ids:
+        return results
+
+    def run(location_id):
+        try:
+            return sync_ghl_location(location_id, resume=resume)
+        finally:
+            connection.close()
+
+    logger.info(f"Syncing {len(location_ids)} GHL locations, {max_workers} at a time")
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(location_ids)), thread_name_prefix='ghl-location') as executor:
+        futures = {executor.submit(run, location_id): location_id for location_id in location_ids}
+        for future in as_completed(futures):
+            location_id = futures[future]
+            try:
+                results[location_id] = future.result()
+            except Exception as e:
+                logger.exception(f"GHL contact sync failed for location {location_id}: {str(e)}")
+                results[location_id] = {'status': 'error', 'error': str(e)}
+
+    log_system_event(
+        f"Completed GHL contact sync for {len(location_ids)} locations",
+        type='sync',
+        status='success' if all(r['status'] == 'done' for r in results.values()) else 'warning',
+        details={'locations': results}
+    )
+    return results
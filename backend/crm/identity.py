@@ -0,0 +1,267 @@
+import logging
+import re
+import threading
+import time
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import Contact
+
+logger = logging.getLogger(__name__)
+
+# Match priority used by the GoHighLevel paths: ID -> Phone -> Email
+GHL_MATCH_ORDER = ('ghl_id', 'phone', 'email')
+# WooCommerce customers: email, then customer id
+WOO_MATCH_ORDER = ('email', 'woo_id')
+
+def normalize_email(email):
+    """Lowercased, trimmed email used as a match key, or None."""
+    email = (email or '').strip().lower()
+    return email or None
+
+# Extension markers: "555-1234 ext. 12", "555-1234 x12", "555-1234 #12"
+_PHONE_EXTENSION = re.compile(r'(?:ext\.?|x|#).*$', re.IGNORECASE)
+
+def normalize_phone(phone):
+    """
+    E.164 form of a phone number ('+15551234567'), or None if it can't be one.
+
+    Formatting and extensions are dropped. Numbers written without a
+    country code ('(555) 123-4567') get
+    PHONE_NORMALIZATION['DEFAULT_COUNTRY_CODE']; '+' and '00' prefixes
+    mark numbers that already include one.
+
+    Args:
+        phone (str): Phone number in any format
+
+    Returns:
+        str: '+' followed by 8 to 15 digits, or None
+    """
+    phone = _PHONE_EXTENSION.sub('', str(phone or '')).strip()
+    digits = re.sub(r'\D', '', phone)
+    config = settings.PHONE_NORMALIZATION
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) == config['NATIONAL_NUMBER_LENGTH']:
+        digits = config['DEFAULT_COUNTRY_CODE'] + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return '+' + digits
+
+class ContactIdentityIndex:
+    """
+    In-memory map from external identities to Contact ids.
+
+    Holds GoHighLevel contact id, WooCommerce customer id, email key
+    (Contact.email_key) and E.164 phone (Contact.normalized_phone) for
+    every contact, so a batch of upstream records
+    is matched without a query per record and every sync and webhook path
+    applies the same matching rules. refresh() folds in contacts changed
+    since the last load with one query; add() records contacts the caller
+    has just written, and load_missing() checks keys the index lacks
+    against the database before callers create contacts for them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.maps = self._empty_maps()
+        self._keys = {}  # contact id -> keys it is indexed under
+        self.loaded_at = None
+        self._full_load = 0
+
+    @staticmethod
+    def _empty_maps():
+        return {'ghl_id': {}, 'woo_id': {}, 'email': {}, 'phone': {}}
+
+    def refresh(self, full=False):
+        """
+        Load the index, or fold in contacts updated since the last load.
+
+        match() doesn't take the lock, so a full load fills new maps and
+        swaps them in when done; other threads keep matching against the
+        previous maps meanwhile instead of seeing a half-filled index.
+
+        Args:
+            full (bool): Rebuild from scratch (drops deleted contacts)
+
+        Returns:
+            ContactIdentityIndex: self
+        """
+        with self._lock:
+            started = timezone.now()
+            full = full or self.loaded_at is None
+            queryset = Contact.objects.all()
+            if not full:
+                queryset = queryset.filter(updated_at__gte=self.loaded_at)
+            rows = queryset.values_list(
+                'id', 'ghl_contact_id', 'woo_customer_id', 'email_key', 'normalized_phone', 'phone'
+            )
+            maps, keys = (self._empty_maps(), {}) if full else (self.maps, self._keys)
+            count = 0
+            for contact_id, ghl_id, woo_id, email_key, normalized_phone, phone in rows.iterator(chunk_size=5000):
+                # Emails are indexed by the stored, unique email_key only: a contact
+                # left without one shares its email with the contact that owns it.
+                # Phones are re-normalized: rows written before migration 0026 may
+                # hold a raw number in normalized_phone, or nothing at all.
+                self._add(contact_id, ghl_id, woo_id, email_key, normalize_phone(normalized_phone or phone),
+                          maps=maps, keys=keys)
+                count += 1
+            if full:
+                self.maps, self._keys = maps, keys
+                self._full_load = time.monotonic()
+                logger.debug(f"Loaded contact identity index with {count} contacts")
+            self.loaded_at = started
+        return self
+
+    def is_stale(self):
+        """Whether the last full load is older than CONTACT_IDENTITY_INDEX['FULL_RELOAD_INTERVAL']."""
+        return time.monotonic() - self._full_load >= settings.CONTACT_IDENTITY_INDEX['FULL_RELOAD_INTERVAL']
+
+    def add(self, contact):
+        """Index a contact that was just created or updated."""
+        with self._lock:
+            self._add(
+                contact.id, contact.ghl_contact_id, contact.woo_customer_id,
+                contact.email_key,
+                normalize_phone(contact.normalized_phone or contact.phone),
+            )
+
+    def _add(self, contact_id, ghl_id, woo_id, email_key, normalized_phone, maps=None, keys=None):
+        maps = self.maps if maps is None else maps
+        keys = self._keys if keys is None else keys
+        # Drop keys the contact no longer has so stale values can't match it
+        for kind, key in keys.pop(contact_id, ()):
+            if maps[kind].get(key) == contact_id:
+                del maps[kind][key]
+        indexed = []
+        for kind, key in (
+            ('ghl_id', ghl_id or None),
+            ('woo_id', woo_id),
+            ('email', email_key or None),
+            ('phone', normalized_phone or None),
+        ):
+            if key is None:
+                continue
+            # Phones aren't unique; like the old .first() lookups, the first contact indexed wins
+            if maps[kind].setdefault(key, contact_id) == contact_id:
+                indexed.append((kind, key))
+        keys[contact_id] = indexed
+
+    def match(self, ghl_id=None, woo_id=None, email=None, phone=None, order=GHL_MATCH_ORDER):
+        """
+        Find the contact id for a set of identities.
+
+        Args:
+            ghl_id (str): GoHighLevel contact id
+            woo_id (int): WooCommerce customer id
+            email (str): Email in any case
+            phone (str): Phone in any format
+            order (tuple): Identity kinds to try, in priority order
+
+        Returns:
+            UUID: The matching contact id, or None
+        """
+        keys = self._lookup_keys(ghl_id, woo_id, email, phone)
+        maps = self.maps
+        for kind in order:
+            # Single get(): an incremental refresh may remove the key concurrently
+            contact_id = maps[kind].get(keys[kind]) if keys[kind] is not None else None
+            if contact_id is not None:
+                return contact_id
+        return None
+
+    @staticmethod
+    def _lookup_keys(ghl_id=None, woo_id=None, email=None, phone=None):
+        return {
+            'ghl_id': ghl_id or None,
+            'woo_id': woo_id or None,
+            'email': normalize_email(email),
+            'phone': normalize_phone(phone),
+        }
+
+    def load_missing(self, identities):
+        """
+        Look up identities the index doesn't hold and index the contacts found.
+
+        updated_at is set when a contact is saved, not when its transaction
+        commits, so an incremental refresh can miss a contact another
+        process committed late. Checking the keys that miss before contacts
+        are created for them keeps such a contact from being duplicated;
+        keys the index already holds cost nothing.
+
+        Args:
+            identities (iterable): dicts of match() keyword arguments (ghl_id, woo_id, email, phone)
+
+        Returns:
+            int: Number of contacts found and indexed
+        """
+        missing = {kind: set() for kind in self.maps}
+        for identity in identities:
+            for kind, key in self._lookup_keys(**identity).items():
+                if key is not None and key not in self.maps[kind]:
+                    missing[kind].add(key)
+        query = Q()
+        for kind, column in (
+            ('ghl_id', 'ghl_contact_id'),
+            ('woo_id', 'woo_customer_id'),
+            ('email', 'email_key'),
+            ('phone', 'normalized_phone'),
+        ):
+            if missing[kind]:
+                query |= Q(**{f'{column}__in': missing[kind]})
+        if not query:
+            return 0
+        rows = list(Contact.objects.filter(query).values_list(
+            'id', 'ghl_contact_id', 'woo_customer_id', 'email_key', 'normalized_phone', 'phone'
+        ))
+        with self._lock:
+            for contact_id, ghl_id, woo_id, email_key, normalized_phone, phone in rows:
+                self._add(contact_id, ghl_id, woo_id, email_key, normalize_phone(normalized_phone or phone))
+        if rows:
+            logger.debug(f"Indexed {len(rows)} contacts the incremental refresh missed")
+        return len(rows)
+
+    def fetch(self, contact_ids):
+        """
+        Load matched contacts with one query.
+
+        Ids of contacts deleted since the index was loaded are left out.
+
+        Returns:
+            dict: contact id -> Contact
+        """
+        return Contact.objects.in_bulk([contact_id for contact_id in set(contact_ids) if contact_id])
+
+    def find(self, order=GHL_MATCH_ORDER, **identities):
+        """Match a single record and return its Contact, or None."""
+        self.load_missing([identities])
+        contact_id = self.match(order=order, **identities)
+        if contact_id is None:
+            return None
+        return self.fetch([contact_id]).get(contact_id)
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+def get_identity_index(full=False):
+    """
+    The process-wide contact identity index, brought up to date.
+
+    The first call loads every contact; later calls fold in contacts
+    changed since the previous call, with a full reload every
+    CONTACT_IDENTITY_INDEX['FULL_RELOAD_INTERVAL'] seconds to drop deleted
+    contacts.
+
+    Args:
+        full (bool): Force a full reload
+
+    Returns:
+        ContactIdentityIndex: The shared index
+    """
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = ContactIdentityIndex()
+    return _shared_index.refresh(full=full or _shared_index.is_stale())
@@ -0,0 +1,246 @@
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import SyncJob
+from .progress import ProgressTracker, ghl_sync_key
+from .utils import log_system_event, sqlite_write_lock
+
+logger = logging.getLogger(__name__)
+
+# job_type -> callable(job) returning a JSON-serializable result
+JOB_HANDLERS = {}
+
+def job_handler(job_type):
+    """Register a function as the handler for a job type."""
+    def register(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return register
+
+def worker_name():
+    """Identifier stored on the jobs a worker process claims."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def enqueue(job_type, payload=None, max_attempts=3, run_after=None):
+    """
+    Queue a job for the worker pool.
+
+    Args:
+        job_type (str): Key in JOB_HANDLERS
+        payload (dict): JSON-serializable arguments for the handler
+        max_attempts (int): Attempts before the job is marked failed
+        run_after (datetime): Don't start the job before this time
+
+    Returns:
+        SyncJob: The queued job
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    job = SyncJob.objects.create(
+        job_type=job_type,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+    logger.info(f"Queued {job_type} job {job.id}")
+    return job
+
+def find_active_job(job_type, **payload):
+    """Return a queued or running job of this type whose payload contains the given values."""
+    filters = {f'payload__{key}': value for key, value in payload.items()}
+    return SyncJob.objects.filter(job_type=job_type, status__in=['queued', 'running'], **filters).first()
+
+def cancel_queued_jobs(job_type):
+    """Mark jobs of this type that no worker has started yet as failed. Returns the count."""
+    return SyncJob.objects.filter(job_type=job_type, status='queued').update(
+        status='failed', error_message='Cancelled by user', finished_at=timezone.now()
+    )
+
+def claim_job(worker):
+    """
+    Claim the next due job for a worker.
+
+    The candidate row is locked with SELECT ... FOR UPDATE SKIP LOCKED so
+    concurrent workers pass over each other's rows, and the claim itself is
+    a conditional UPDATE so it stays safe on backends without row locks.
+
+    Args:
+        worker (str): Name recorded in locked_by
+
+    Returns:
+        SyncJob: The claimed job, or None if nothing is due
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            SyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = SyncJob.objects.filter(id=job.id, status='queued').update(
+            status='running',
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+def heartbeat(job_id, stopping, interval=None):
+    """
+    Refresh a running job's locked_at every interval seconds until stopping is set.
+
+    requeue_stale_jobs treats a job whose heartbeat is older than
+    JOB_QUEUE['STALE_AFTER'] as abandoned by its worker.
+    """
+    interval = interval or settings.JOB_QUEUE['HEARTBEAT_INTERVAL']
+    try:
+        while not stopping.wait(interval):
+            try:
+                with sqlite_write_lock():
+                    SyncJob.objects.filter(id=job_id, status='running').update(locked_at=timezone.now())
+            except Exception as e:
+                logger.warning(f"Failed to record heartbeat for job {job_id}: {str(e)}")
+    finally:
+        connection.close()
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome.
+
+    While the handler runs, a heartbeat thread keeps locked_at current.
+    Failed jobs are requeued with an exponential delay until max_attempts
+    is reached, then marked failed.
+    """
+    handler = JOB_HANDLERS.get(job.job_type)
+    stopping = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(job.id, stopping), name=f'job-heartbeat-{job.id}', daemon=True)
+    beat.start()
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job type {job.job_type}")
+        logger.info(f"Running {job.job_type} job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+        result = handler(job)
+    except Exception as e:
+        logger.exception(f"{job.job_type} job {job.id} failed: {str(e)}")
+        job.error_message = str(e)
+        job.locked_by = ''
+        job.locked_at = None
+        if handler is not None and job.attempts < job.max_attempts:
+            delay = settings.JOB_QUEUE['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            log_system_event(
+                message=f"{job.job_type} job failed after {job.attempts} attempts: {str(e)}",
+                type='sync',
+                status='error',
+                details={'job_id': str(job.id), 'job_type': job.job_type, 'error': str(e)}
+            )
+        job.save(update_fields=['status', 'error_message', 'locked_by', 'locked_at', 'run_after', 'finished_at'])
+        return job
+    finally:
+        stopping.set()
+        beat.join()
+
+    job.status = 'done'
+    job.result = result
+    job.error_message = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error_message', 'finished_at'])
+    logger.info(f"Finished {job.job_type} job {job.id}")
+    return job
+
+def requeue_stale_jobs(stale_after=None):
+    """
+    Put running jobs whose worker stopped sending heartbeats back on the queue.
+
+    Jobs that have used all their attempts are marked failed instead.
+
+    Returns:
+        int: Number of jobs requeued
+    """
+    stale_after = stale_after or settings.JOB_QUEUE['STALE_AFTER']
+    now = timezone.now()
+    stale = SyncJob.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=stale_after))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', error_message='Worker stopped responding', locked_by='', locked_at=None, finished_at=now
+    )
+    if failed:
+        log_system_event(
+            message=f"{failed} jobs failed after their worker stopped responding on the last attempt",
+            type='sync',
+            status='error',
+            details={'failed': failed}
+        )
+    count = stale.filter(attempts__lt=F('max_attempts')).update(
+        status='queued', locked_by='', locked_at=None
+    )
+    if count:
+        logger.warning(f"Requeued {count} stale jobs")
+    return count
+
+def job_to_dict(job):
+    """Serialize a job for API responses."""
+    return {
+        'job_id': str(job.id),
+        'job_type': job.job_type,
+        'status': job.status,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error_message,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+@job_handler('woo_sync')
+def woo_sync_job(job):
+    from .woo_sync import run_woocommerce_sync
+    return run_woocommerce_sync(
+        sync_types=job.payload.get('sync_types'),
+        incremental=job.payload.get('incremental', False),
+    )
+
+@job_handler('woo_update_members')
+def woo_update_members_job(job):
+    from .woo_sync import update_contacts_from_woocommerce
+    results = update_contacts_from_woocommerce(job.payload['emails'])
+    return {'results': results}
+
+@job_handler('ghl_sync')
+def ghl_sync_job(job):
+    from .ghl_sync import sync_ghl_location
+    location_id = job.payload['location_id']
+    progress = ProgressTracker(ghl_sync_key(location_id))
+    progress.start('Starting GoHighLevel sync')
+    # A retried job continues after the pages its earlier attempt checkpointed
+    return sync_ghl_location(location_id, resume=job.attempts > 1, progress=progress)
+
+@job_handler('ghl_sync_all')
+def ghl_sync_all_job(job):
+    from .ghl_sync import sync_ghl_locations
+    from .models import OAuth2Token
+    location_ids = job.payload.get('location_ids') or list(
+        OAuth2Token.objects.exclude(location_id='').values_list('location_id', flat=True)
+    )
+    # Locations already being synced by their own job are left to it
+    busy = [location_id for location_id in location_ids if find_active_job('ghl_sync', location_id=location_id)]
+    results = sync_ghl_locations(
+        [location_id for location_id in location_ids if location_id not in busy],
+        max_workers=job.payload.get('max_workers'),
+        resume=job.attempts > 1,
+    )
+    return {'locations': results, 'skipped': busy}
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from crm.identity import normalize_phone
+from crm.models import Contact
+
+class Command(BaseCommand):
+    help = 'Recompute Contact.normalized_phone (E.164) for existing contacts in batches, e.g. after changing PHONE_NORMALIZATION'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Contacts read and written per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Count the contacts that would change without writing')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        scanned = 0
+        changed = 0
+        last_id = None
+        
+        # Walk the table in primary key order so each batch is an index range scan
+        while True:
+            queryset = Contact.objects.order_by('id').only('id', 'phone', 'normalized_phone', 'updated_at')
+            if last_id is not None:
+                queryset = queryset.filter(id__gt=last_id)
+            batch = list(queryset[:batch_size])
+            if not batch:
+                break
+            
+            updates = []
+            now = timezone.now()
+            for contact in batch:
+                normalized = normalize_phone(contact.phone)
+                if contact.normalized_phone != normalized:
+                    contact.normalized_phone = normalized
+                    # Bumped so running identity indexes pick up the new value
+                    contact.updated_at = now
+                    updates.append(contact)
+            if updates and not dry_run:
+                Contact.objects.bulk_update(updates, ['normalized_phone', 'updated_at'])
+            
+            scanned += len(batch)
+            changed += len(updates)
+            last_id = batch[-1].id
+            self.stdout.write(f"Scanned {scanned} contacts, {changed} {'to update' if dry_run else 'updated'}")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Dry run: ' if dry_run else ''}{changed} of {scanned} contacts "
+            f"{'would get' if dry_run else 'got'} a new normalized phone"
+        ))
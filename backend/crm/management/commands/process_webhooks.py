@@ -0,0 +1,63 @@
+import logging
+import signal
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from crm.webhooks import drain_webhooks, requeue_stale_webhooks
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Process queued appointment webhooks in batches with a bounded worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.WEBHOOK_QUEUE['BATCH_SIZE'],
+                            help='Number of webhooks claimed per batch')
+        parser.add_argument('--workers', type=int, default=settings.WEBHOOK_QUEUE['WORKERS'],
+                            help='Number of webhooks processed concurrently')
+        parser.add_argument('--poll-interval', type=float, default=settings.WEBHOOK_QUEUE['POLL_INTERVAL'],
+                            help='Seconds to wait before checking an empty queue again')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling forever')
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+        
+        requeued = requeue_stale_webhooks()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} webhooks left processing by a dead worker"))
+        
+        self.stdout.write(f"Webhook worker started ({options['workers']} workers, batches of {options['batch_size']})")
+        last_requeue = time.monotonic()
+        while not stopping.is_set():
+            close_old_connections()
+            try:
+                counts = drain_webhooks(options['batch_size'], options['workers'], stopping)
+                if counts['processed']:
+                    self.stdout.write(
+                        f"Processed {counts['processed']} webhooks: "
+                        f"{counts['success']} succeeded, {counts['error']} failed"
+                    )
+            except Exception as e:
+                logger.exception(f"Webhook worker error: {str(e)}")
+            
+            if options['once']:
+                break
+            
+            # Pick up logs from other webhook workers that died mid-batch
+            if time.monotonic() - last_requeue >= settings.WEBHOOK_QUEUE['STALE_AFTER']:
+                last_requeue = time.monotonic()
+                try:
+                    requeue_stale_webhooks()
+                except Exception as e:
+                    logger.exception(f"Webhook worker failed to requeue stale webhooks: {str(e)}")
+            
+            try:
+                stopping.wait(options['poll_interval'])
+            except KeyboardInterrupt:
+                break
+        
+        self.stdout.write("Webhook worker stopped")
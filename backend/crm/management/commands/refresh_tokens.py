@@ -1,9 +1,8 @@
 import logging
 from datetime import timedelta
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from crm.models import OAuth2Token
-from crm.ghl_oauth import refresh_token
+from crm.ghl_oauth import refresh_due_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -17,38 +16,32 @@ class Command(BaseCommand):
             default=6,
             help='Refresh tokens that will expire within this many hours'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.TOKEN_REFRESH['CONCURRENCY'],
+            help='Number of tokens refreshed concurrently'
+        )
 
     def handle(self, *args, **options):
         hours = options['hours']
         self.stdout.write(f"Checking for tokens that will expire in the next {hours} hours...")
         
-        expiry_threshold = timezone.now() + timedelta(hours=hours)
+        results = refresh_due_tokens(timedelta(hours=hours), max_workers=options['workers'])
         
-        # Find tokens that will expire within the specified time but haven't expired yet
-        expiring_tokens = OAuth2Token.objects.filter(
-            expires_at__lt=expiry_threshold,
-            expires_at__gt=timezone.now()
-        )
-        
-        count = expiring_tokens.count()
-        if count > 0:
-            self.stdout.write(f"Found {count} tokens that need refreshing")
-            
-            for token in expiring_tokens:
-                try:
-                    self.stdout.write(f"Refreshing token for location {token.location_id}")
-                    old_expires_at = token.expires_at
-                    
-                    refreshed_token = refresh_token(token)
-                    
-                    self.stdout.write(self.style.SUCCESS(
-                        f"Successfully refreshed token for location {token.location_id}. "
-                        f"New expiry: {refreshed_token.expires_at} "
-                        f"(was: {old_expires_at})"
-                    ))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(
-                        f"Failed to refresh token for location {token.location_id}: {str(e)}"
-                    ))
-        else:
+        if not results:
             self.stdout.write("No tokens need refreshing at this time")
+            return
+        
+        self.stdout.write(f"Processed {len(results)} tokens that needed refreshing")
+        for result in results:
+            if result['refreshed']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Successfully refreshed token for location {result['location_id']}. "
+                    f"New expiry: {result['expires_at']} "
+                    f"(was: {result['old_expires_at']})"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f"Failed to refresh token for location {result['location_id']}: {result['error']}"
+                ))
@@ -0,0 +1,77 @@
+import logging
+import signal
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Min
+from django.utils import timezone
+from crm.ghl_oauth import refresh_due_tokens, refresh_stale_location_metadata
+from crm.models import OAuth2Token
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Keep GoHighLevel OAuth tokens fresh, refreshing each shortly before it expires, and keep location metadata current'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-time', type=int, default=settings.TOKEN_REFRESH['LEAD_TIME'],
+                            help='Refresh tokens this many seconds before they expire')
+        parser.add_argument('--workers', type=int, default=settings.TOKEN_REFRESH['CONCURRENCY'],
+                            help='Number of tokens refreshed concurrently')
+        parser.add_argument('--once', action='store_true',
+                            help='Refresh the tokens that are due and exit')
+
+    def handle(self, *args, **options):
+        lead_time = timedelta(seconds=options['lead_time'])
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+        
+        self.stdout.write(f"Token refresher started (lead time {lead_time})")
+        while not stopping.is_set():
+            close_old_connections()
+            failed = False
+            try:
+                for result in refresh_due_tokens(lead_time, max_workers=options['workers']):
+                    if result['refreshed']:
+                        self.stdout.write(self.style.SUCCESS(
+                            f"Refreshed token for location {result['location_id']}. New expiry: {result['expires_at']}"
+                        ))
+                    else:
+                        failed = True
+                        self.stdout.write(self.style.ERROR(
+                            f"Failed to refresh token for location {result['location_id']}: {result['error']}"
+                        ))
+            except Exception as e:
+                failed = True
+                logger.exception(f"Token refresher error: {str(e)}")
+            
+            # Location metadata changes rarely; it is re-fetched here, off the refresh path
+            try:
+                for location_id, updated in refresh_stale_location_metadata(max_workers=options['workers']).items():
+                    if not updated:
+                        self.stdout.write(self.style.WARNING(f"Failed to fetch metadata for location {location_id}"))
+            except Exception as e:
+                logger.exception(f"Location metadata refresh error: {str(e)}")
+            
+            if options['once']:
+                break
+            
+            try:
+                stopping.wait(self.seconds_until_next_refresh(lead_time, failed))
+            except KeyboardInterrupt:
+                break
+        
+        self.stdout.write("Token refresher stopped")
+
+    def seconds_until_next_refresh(self, lead_time, failed):
+        """Sleep until the next token comes due, capped so new tokens and failures are revisited."""
+        config = settings.TOKEN_REFRESH
+        next_expiry = OAuth2Token.objects.aggregate(next_expiry=Min('expires_at'))['next_expiry']
+        if next_expiry is None:
+            return config['MAX_SLEEP']
+        seconds = (next_expiry - lead_time - timezone.now()).total_seconds()
+        # A token that is still due failed to refresh: retry after a pause instead of spinning
+        floor = config['RETRY_DELAY'] if failed or seconds <= 0 else 0
+        return min(max(seconds, floor, 1), config['MAX_SLEEP'])
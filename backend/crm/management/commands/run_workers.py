@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from crm.jobs import claim_job, requeue_stale_jobs, run_job, worker_name
+
+logger = logging.getLogger(__name__)
+
+def work(poll_interval, once):
+    """Claim and run jobs until stopped (or, with once, until the queue is empty)."""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    # Ctrl-C is handled by the parent, which asks workers to finish their current job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    name = worker_name()
+    logger.info(f"Worker {name} started")
+    last_requeue = time.monotonic()
+    
+    while not stopping:
+        close_old_connections()
+        try:
+            job = claim_job(name)
+        except Exception as e:
+            logger.exception(f"Worker {name} failed to claim a job: {str(e)}")
+            job = None
+        if job is None:
+            if once:
+                break
+            # Pick up jobs from workers (on any host) that stopped sending heartbeats
+            if time.monotonic() - last_requeue >= settings.JOB_QUEUE['STALE_AFTER']:
+                last_requeue = time.monotonic()
+                try:
+                    requeue_stale_jobs()
+                except Exception as e:
+                    logger.exception(f"Worker {name} failed to requeue stale jobs: {str(e)}")
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+    
+    logger.info(f"Worker {name} stopped")
+
+class Command(BaseCommand):
+    help = 'Run a pool of worker processes that execute queued sync jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOB_QUEUE['WORKERS'],
+                            help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_QUEUE['POLL_INTERVAL'],
+                            help='Seconds an idle worker waits before checking the queue again')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling forever')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        once = options['once']
+        
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} jobs left running by a dead worker"))
+        
+        # Forked children must not share the parent's database connection
+        connections.close_all()
+        
+        processes = [
+            multiprocessing.Process(target=work, args=(poll_interval, once), daemon=True)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {workers} workers")
+        
+        def shutdown(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        signal.signal(signal.SIGTERM, shutdown)
+        
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            shutdown(signal.SIGINT, None)
+            for process in processes:
+                process.join()
+        self.stdout.write(self.style.SUCCESS("All workers stopped"))
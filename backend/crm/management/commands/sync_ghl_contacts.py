@@ -2,8 +2,9 @@ import time
 from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from crm.models import OAuth2Token, SystemLog, SyncState
-from crm.ghl_sync import sync_all_ghl_contacts, sync_updated_ghl_contacts
+from crm.models import OAuth2Token, SystemLog
+from crm.ghl_sync import SyncCheckpoint, start_ghl_sync_state, sync_all_ghl_contacts, sync_updated_ghl_contacts
+from crm.progress import ProgressTracker, ghl_sync_key
 from crm.utils import log_system_event
 
 class Command(BaseCommand):
@@ -12,7 +13,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--location-id', type=str, help='GoHighLevel location ID')
         parser.add_argument('--page-limit', type=int, default=100, help='Number of contacts per page')
-        parser.add_argument('--start-page', type=int, default=1, help='Page to start syncing from')
+        parser.add_argument('--start-page', type=int, default=1, help='Page to start syncing from; pages are then walked by number instead of with cursors')
         parser.add_argument('--max-pages', type=int, help='Maximum number of pages to process')
         parser.add_argument('--no-progress', action='store_true', help='Disable progress tracking')
         parser.add_argument('--modified-after', type=str, help='Only sync contacts modified after this date (YYYY-MM-DD)')
@@ -43,20 +44,6 @@ class Command(BaseCommand):
         max_pages = options['max_pages']
         track_progress = not options['no_progress']
         
-        # Check if we should resume from a previous sync
-        if options['resume']:
-            sync_state = SyncState.objects.filter(
-                sync_type='ghl_contacts',
-                location_id=location_id,
-                is_complete=False
-            ).first()
-            
-            if sync_state:
-                start_page = sync_state.last_page_processed + 1
-                self.stdout.write(f"Resuming sync from page {start_page}")
-            else:
-                self.stdout.write("No incomplete sync found to resume")
-        
         # Parse modified_after date if provided
         modified_after = None
         if options['modified_after']:
@@ -76,15 +63,36 @@ class Command(BaseCommand):
             ))
             return
         
-        # Create or update sync state
-        sync_state, created = SyncState.objects.update_or_create(
-            sync_type='ghl_contacts',
-            location_id=location_id,
-            defaults={
-                'last_sync_time': timezone.now(),
-                'is_complete': False
-            }
-        )
+        # Create or update sync state, or pick up an interrupted one
+        sync_state, resumed = start_ghl_sync_state(location_id, resume=options['resume'], start_page=start_page)
+        search_after = None
+        if resumed:
+            # The checkpoint was committed with its page, so everything up
+            # to it is already in the database and counted
+            start_page = sync_state.last_page_processed + 1
+            search_after = sync_state.cursor
+            if search_after is not None:
+                self.stdout.write(f"Resuming sync after cursor {search_after} (page {start_page})")
+            else:
+                self.stdout.write(f"Resuming sync from page {start_page}")
+            self.stdout.write(
+                f"Already synced: {sync_state.success_count} contacts, {sync_state.error_count} errors"
+            )
+        elif options['resume']:
+            self.stdout.write("No incomplete sync found to resume")
+        
+        # A cursor can only start from the beginning or a saved cursor, so
+        # starting anywhere else (--start-page, or resuming a sync that had
+        # no cursor) walks pages by number
+        use_cursor = None
+        if search_after is None and start_page > 1:
+            use_cursor = False
+            self.stdout.write(f"Using page-number pagination from page {start_page}")
+        
+        checkpoint = SyncCheckpoint(sync_state)
+        # The sync reports stops and failures through the tracker's final status
+        progress = ProgressTracker(ghl_sync_key(location_id))
+        progress.start('Starting GoHighLevel sync')
         
         try:
             # If chunked sync is requested
@@ -97,9 +105,12 @@ class Command(BaseCommand):
                 current_page = start_page
                 total_success = 0
                 total_errors = 0
+                finished = False
                 
                 while True:
                     self.stdout.write(f"Processing chunk starting at page {current_page}")
+                    checkpoint.begin_run()
+                    progress.update(status='in_progress')
                     
                     # Process a chunk of pages
                     success, errors, last_page = sync_all_ghl_contacts(
@@ -108,24 +119,30 @@ class Command(BaseCommand):
                         start_page=current_page,
                         max_pages=chunk_size,
                         track_progress=track_progress,
-                        sync_modified_after=modified_after
+                        sync_modified_after=modified_after,
+                        use_cursor=use_cursor,
+                        search_after=search_after,
+                        progress=progress,
+                        on_page=checkpoint
                     )
                     
                     total_success += success
                     total_errors += errors
-                    
-                    # Update sync state
-                    sync_state.last_page_processed = last_page
-                    sync_state.success_count = total_success
-                    sync_state.error_count = total_errors
-                    sync_state.save()
+                    search_after = sync_state.cursor
                     
                     self.stdout.write(self.style.SUCCESS(
                         f"Chunk completed: {success} contacts synced, {errors} errors. Last page: {last_page}"
                     ))
                     
+                    # A stopped or failed chunk leaves the rest for --resume
+                    if progress.status != 'done':
+                        break
+                    
                     # If we've reached the end or hit max_pages
-                    if last_page < current_page + chunk_size - 1 or (max_pages and last_page >= start_page + max_pages - 1):
+                    if last_page < current_page + chunk_size - 1:
+                        finished = True
+                        break
+                    if max_pages and last_page >= start_page + max_pages - 1:
                         break
                     
                     # Update current page for next chunk
@@ -135,14 +152,13 @@ class Command(BaseCommand):
                     self.stdout.write(f"Waiting {chunk_delay} seconds before next chunk...")
                     time.sleep(chunk_delay)
                 
-                self.stdout.write(self.style.SUCCESS(
-                    f"Chunked sync completed: {total_success} contacts synced, {total_errors} errors"
-                ))
-                
-                # Mark sync as complete
-                sync_state.is_complete = True
-                sync_state.total_pages = last_page
-                sync_state.save()
+                if finished:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Chunked sync completed: {total_success} contacts synced, {total_errors} errors"
+                    ))
+                    checkpoint.complete(last_page)
+                else:
+                    self.report_unfinished(progress, total_success, total_errors, last_page)
                 
             else:
                 # Regular sync
@@ -154,20 +170,22 @@ class Command(BaseCommand):
                     start_page=start_page,
                     max_pages=max_pages,
                     track_progress=track_progress,
-                    sync_modified_after=modified_after
+                    sync_modified_after=modified_after,
+                    use_cursor=use_cursor,
+                    search_after=search_after,
+                    progress=progress,
+                    on_page=checkpoint
                 )
                 
-                # Update sync state
-                sync_state.last_page_processed = last_page
-                sync_state.success_count = success
-                sync_state.error_count = errors
-                sync_state.is_complete = True
-                sync_state.total_pages = last_page
-                sync_state.save()
-                
-                self.stdout.write(self.style.SUCCESS(
-                    f"Sync completed: {success} contacts synced, {errors} errors. Last page: {last_page}"
-                ))
+                # Counts and last page were checkpointed page by page; only a sync
+                # that reached the end of the contact list is complete
+                if progress.status == 'done' and not (max_pages and last_page - start_page + 1 >= max_pages):
+                    checkpoint.complete(last_page)
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Sync completed: {success} contacts synced, {errors} errors. Last page: {last_page}"
+                    ))
+                else:
+                    self.report_unfinished(progress, success, errors, last_page)
                 
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING("Sync interrupted by user"))
@@ -196,3 +214,11 @@ class Command(BaseCommand):
                 }
             )
             raise
+
+    def report_unfinished(self, progress, success, errors, last_page):
+        """Report a sync that stopped before the end of the contact list; its checkpoint is kept."""
+        reason = 'page limit reached' if progress.status == 'done' else progress.message or progress.status
+        self.stdout.write(self.style.WARNING(
+            f"Sync not finished ({reason}): {success} contacts synced, "
+            f"{errors} errors. Last page: {last_page}. Run with --resume to continue."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from crm.models import OAuth2Token
+from crm.ghl_sync import sync_ghl_locations
+
+class Command(BaseCommand):
+    help = 'Sync contacts from every connected GoHighLevel location concurrently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location-id', action='append', dest='location_ids',
+                            help='Location to sync (repeatable; defaults to every connected location)')
+        parser.add_argument('--max-workers', type=int,
+                            help='Locations synced at once (defaults to GOHIGHLEVEL_SYNC MAX_LOCATIONS)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Resume each location from its last interrupted sync')
+
+    def handle(self, *args, **options):
+        location_ids = options['location_ids']
+        if not location_ids:
+            location_ids = list(OAuth2Token.objects.exclude(location_id='').values_list('location_id', flat=True))
+            if not location_ids:
+                raise CommandError('No OAuth tokens found. Please authenticate with GoHighLevel first.')
+        
+        self.stdout.write(f"Syncing {len(location_ids)} locations")
+        results = sync_ghl_locations(location_ids, max_workers=options['max_workers'], resume=options['resume'])
+        
+        for location_id, result in results.items():
+            if result['status'] == 'done':
+                self.stdout.write(self.style.SUCCESS(
+                    f"{location_id}: {result['success']} contacts synced, {result['errors']} errors. "
+                    f"Last page: {result['last_page']}"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f"{location_id}: sync {result['status']}: {result.get('error') or result.get('message')}"
+                ))
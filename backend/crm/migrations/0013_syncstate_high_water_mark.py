@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0012_appointment_appointmentwebhooklog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='high_water_mark',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0013_syncstate_high_water_mark'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='woo_order_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
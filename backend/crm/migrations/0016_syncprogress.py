@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0015_syncjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150, unique=True)),
+                ('status', models.CharField(default='idle', max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('counters', models.JSONField(blank=True, default=dict)),
+                ('should_stop', models.BooleanField(default=False)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Sync Progress',
+                'verbose_name_plural': 'Sync Progress',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0016_syncprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='ghl_data_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='woo_data_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0017_contact_payload_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='cursor',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
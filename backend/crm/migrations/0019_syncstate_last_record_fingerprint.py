@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0018_syncstate_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncstate',
+            name='last_record_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0019_syncstate_last_record_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='normalized_phone',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+    ]
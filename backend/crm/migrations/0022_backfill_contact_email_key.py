@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:38
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_email_keys(apps, schema_editor):
+    """
+    Fill Contact.email_key in primary key batches.
+
+    email_key becomes unique in the next migration, so when several
+    contacts share an email up to case only the oldest gets the key; the
+    others keep NULL until they are merged.
+    """
+    Contact = apps.get_model('crm', 'Contact')
+    duplicates = 0
+    last_id = None
+    while True:
+        queryset = Contact.objects.order_by('id').only('id', 'email', 'email_key', 'created_at')
+        if last_id is not None:
+            queryset = queryset.filter(id__gt=last_id)
+        batch = list(queryset[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for contact in batch:
+            contact.email_key = (contact.email or '').strip().lower() or None
+        Contact.objects.bulk_update(batch, ['email_key'])
+
+    # Resolve case-only duplicates: keep the key on the oldest contact
+    keyed = Contact.objects.filter(email_key__isnull=False).order_by('email_key', 'created_at')
+    clear = []
+    previous = None
+    for contact_id, email_key in keyed.values_list('id', 'email_key').iterator(chunk_size=BATCH_SIZE):
+        if email_key == previous:
+            clear.append(contact_id)
+        previous = email_key
+    for start in range(0, len(clear), BATCH_SIZE):
+        duplicates += Contact.objects.filter(id__in=clear[start:start + BATCH_SIZE]).update(email_key=None)
+    if duplicates:
+        print(f"\n  {duplicates} contacts share an email with an older contact and were left without an email_key")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0021_contact_email_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_email_keys, migrations.RunPython.noop),
+    ]
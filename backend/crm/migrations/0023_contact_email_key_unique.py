@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0022_backfill_contact_email_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='email_key',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0023_contact_email_key_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oauth2token',
+            name='location_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='oauth2token',
+            name='location_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='oauth2token',
+            name='location_timezone',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
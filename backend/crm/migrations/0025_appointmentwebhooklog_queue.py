@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0024_oauth2token_location_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointmentwebhooklog',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='appointmentwebhooklog',
+            name='status',
+            field=models.CharField(choices=[('success', 'Success'), ('error', 'Error'), ('pending', 'Pending'), ('processing', 'Processing')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentwebhooklog',
+            index=models.Index(fields=['status', 'created_at'], name='crm_appoint_status_cf7264_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:10
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def backfill_normalized_phones(apps, schema_editor):
+    """
+    Rewrite Contact.normalized_phone in E.164 form in primary key batches.
+
+    Contacts synced from GoHighLevel before normalization was added hold
+    the raw phone in this column. updated_at is bumped so identity indexes
+    in running processes pick up the new values.
+    """
+    from crm.identity import normalize_phone
+    Contact = apps.get_model('crm', 'Contact')
+    now = timezone.now()
+    last_id = None
+    while True:
+        queryset = Contact.objects.order_by('id').only('id', 'phone', 'normalized_phone', 'updated_at')
+        if last_id is not None:
+            queryset = queryset.filter(id__gt=last_id)
+        batch = list(queryset[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        updates = []
+        for contact in batch:
+            normalized = normalize_phone(contact.phone)
+            if contact.normalized_phone != normalized:
+                contact.normalized_phone = normalized
+                contact.updated_at = now
+                updates.append(contact)
+        Contact.objects.bulk_update(updates, ['normalized_phone', 'updated_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0025_appointmentwebhooklog_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_normalized_phones, migrations.RunPython.noop),
+    ]
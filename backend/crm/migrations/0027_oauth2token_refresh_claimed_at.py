@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0026_backfill_contact_normalized_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oauth2token',
+            name='refresh_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -12,8 +12,9 @@ class Contact(models.Model):
     first_name = models.CharField(max_length=100, blank=True, default='')
     last_name = models.CharField(max_length=100, blank=True, default='')
     email = models.EmailField(unique=True, null=True, blank=True)
+    email_key = models.CharField(max_length=254, unique=True, null=True, blank=True, editable=False)  # Lowercased, trimmed email used for matching
     phone = models.CharField(max_length=50, null=True, blank=True)
-    normalized_phone = models.CharField(max_length=50, null=True, blank=True)
+    normalized_phone = models.CharField(max_length=50, null=True, blank=True, db_index=True)  # E.164, see crm.identity.normalize_phone
     billing_address = models.TextField(blank=True)
     billing_city = models.CharField(max_length=100, blank=True)
     billing_state = models.CharField(max_length=100, blank=True)
@@ -25,6 +26,8 @@ class Contact(models.Model):
     ], default='crm')
     woo_data = models.JSONField(null=True, blank=True)
     ghl_data = models.JSONField(null=True, blank=True)
+    woo_data_hash = models.CharField(max_length=64, blank=True, default='')  # payload_fingerprint(woo_data)
+    ghl_data_hash = models.CharField(max_length=64, blank=True, default='')  # payload_fingerprint(ghl_data)
     ghl_tags = models.JSONField(default=list, blank=True)
     ghl_custom_fields = models.JSONField(default=list, blank=True)
     woo_last_sync = models.DateTimeField(null=True, blank=True)
@@ -55,13 +58,34 @@ class Contact(models.Model):
             sources.append("CRM Only")
         return ", ".join(sources)
 
+    def save(self, *args, **kwargs):
+        from .identity import normalize_email, normalize_phone
+        # Keep the indexed match keys in step with the raw values
+        email_key = normalize_email(self.email)
+        if email_key != self.email_key and email_key is not None:
+            # email_key is unique: a contact whose email differs from another's
+            # only by case (kept by migration 0022) stays without a key
+            if Contact.objects.filter(email_key=email_key).exclude(pk=self.pk).exists():
+                email_key = None
+        self.email_key = email_key
+        self.normalized_phone = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'email' in update_fields:
+                update_fields.add('email_key')
+            if 'phone' in update_fields:
+                update_fields.add('normalized_phone')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
 
 class Order(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='orders')
-    woo_order_id = models.CharField(max_length=100)
+    woo_order_id = models.CharField(max_length=100, unique=True)
     order_date = models.DateTimeField()
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=50)
@@ -97,20 +121,27 @@ class OAuth2Token(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     location_id = models.CharField(max_length=100, unique=True)
     location_name = models.CharField(max_length=255, blank=True)
+    # Location metadata cached from GET /locations/{id} (see crm.ghl_oauth.refresh_location_metadata)
+    location_timezone = models.CharField(max_length=64, blank=True)
+    location_data = models.JSONField(null=True, blank=True)
+    location_synced_at = models.DateTimeField(null=True, blank=True)
     access_token = models.TextField()
     refresh_token = models.TextField()
     expires_at = models.DateTimeField()
+    # Set while one process refreshes the token (see crm.ghl_oauth._refresh_if_due)
+    refresh_claimed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Tokens count as expired this long before expires_at, so they are refreshed in time
+    EXPIRY_BUFFER = datetime.timedelta(minutes=5)
+
     def __str__(self):
         return f"Token for {self.location_name or self.location_id}"
     
     @property
     def is_expired(self):
-        # Add a 5-minute buffer to ensure we refresh before actual expiration
-        buffer = datetime.timedelta(minutes=5)
-        return timezone.now() + buffer >= self.expires_at
+        return timezone.now() + self.EXPIRY_BUFFER >= self.expires_at
 
 class TokenRequestLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -189,6 +220,9 @@ class SyncState(models.Model):
     success_count = models.IntegerField(default=0)
     error_count = models.IntegerField(default=0)
     last_sync_time = models.DateTimeField(null=True, blank=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)  # Latest upstream modification seen (incremental syncs)
+    cursor = models.JSONField(null=True, blank=True)  # searchAfter cursor to resume a GHL sync from
+    last_record_fingerprint = models.CharField(max_length=64, blank=True)  # Fingerprint of the last record checkpointed
     is_complete = models.BooleanField(default=False)
     
     class Meta:
@@ -199,6 +233,60 @@ class SyncState(models.Model):
     def __str__(self):
         return f"{self.get_sync_type_display()} - {self.last_sync_time}"
 
+class SyncProgress(models.Model):
+    """
+    Live progress of a running sync, shared by every web and worker process.
+    Written by crm.progress.ProgressTracker; one row per sync key.
+    """
+    key = models.CharField(max_length=150, unique=True)
+    status = models.CharField(max_length=20, default='idle')
+    message = models.TextField(blank=True)
+    counters = models.JSONField(default=dict, blank=True)
+    should_stop = models.BooleanField(default=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Sync Progress'
+        verbose_name_plural = 'Sync Progress'
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+class SyncJob(models.Model):
+    """
+    Background job queued by the web tier and executed by `run_workers`.
+    """
+    STATUS = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        verbose_name = 'Sync Job'
+        verbose_name_plural = 'Sync Jobs'
+
+    def __str__(self):
+        return f"{self.job_type} ({self.status}) - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+
 class Appointment(models.Model):
     """
     Model to store appointment data received from webhooks.
@@ -239,16 +327,19 @@ class AppointmentWebhookLog(models.Model):
         ('success', 'Success'),
         ('error', 'Error'),
         ('pending', 'Pending'),
+        ('processing', 'Processing'),
     ], default='pending')
     error_message = models.TextField(blank=True)
     processed = models.BooleanField(default=False)
     created_appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)  # When a webhook worker claimed the log
 
     def __str__(self):
         return f"Webhook {self.source} - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
         verbose_name = 'Appointment Webhook Log'
         verbose_name_plural = 'Appointment Webhook Logs'
@@ -0,0 +1,154 @@
+import logging
+import time
+from django.conf import settings
+from django.utils import timezone
+from .models import SyncProgress
+from .utils import sqlite_write_lock
+
+logger = logging.getLogger(__name__)
+
+WOO_SYNC_KEY = 'woo_sync'
+
+def ghl_sync_key(location_id):
+    return f"ghl_sync:{location_id}"
+
+class ProgressTracker:
+    """
+    Reports a sync's progress to the shared SyncProgress table.
+
+    Counters are kept in memory and written at most every `write_interval`
+    seconds (status changes and finish() always write), and the stop flag
+    is re-read at most every `stop_check_interval` seconds, so a sync
+    costs a few tiny single-row statements per second regardless of how
+    fast it processes records.
+    """
+
+    def __init__(self, key, write_interval=None, stop_check_interval=None):
+        self.key = key
+        self.write_interval = settings.SYNC_PROGRESS['WRITE_INTERVAL'] if write_interval is None else write_interval
+        self.stop_check_interval = settings.SYNC_PROGRESS['STOP_CHECK_INTERVAL'] if stop_check_interval is None else stop_check_interval
+        self.status = 'idle'
+        self.message = ''
+        self.counters = {}
+        self._last_write = 0
+        self._last_stop_check = 0
+        self._stopped = False
+
+    def start(self, message='', **counters):
+        """
+        Reset the row for a new run.
+
+        A stop requested while the run was queued (reset_progress with
+        'queued') still applies; one left over from an earlier run is cleared.
+        """
+        self.status = 'in_progress'
+        self.message = message
+        self.counters = counters
+        self._stopped = False
+        now = timezone.now()
+        with sqlite_write_lock():
+            SyncProgress.objects.filter(key=self.key).exclude(status='queued').update(should_stop=False)
+            SyncProgress.objects.update_or_create(
+                key=self.key,
+                defaults={
+                    'status': self.status,
+                    'message': message,
+                    'counters': counters,
+                    'started_at': now,
+                    'updated_at': now,
+                }
+            )
+        self._last_write = time.monotonic()
+        # Check the stop flag on the first should_stop() call
+        self._last_stop_check = 0
+
+    def update(self, message=None, status=None, reset=False, force=False, **counters):
+        """
+        Record progress, writing it out if the write interval has passed.
+
+        Args:
+            message (str): New status message
+            status (str): New status; a status change is always written
+            reset (bool): Replace the counters instead of merging into them
+            force (bool): Write now regardless of the interval
+            **counters: Counter values to merge (current, total, success, errors, ...)
+        """
+        if message is not None:
+            self.message = message
+        if status is not None and status != self.status:
+            self.status = status
+            force = True
+        if reset:
+            self.counters = {}
+        self.counters.update(counters)
+        if force or time.monotonic() - self._last_write >= self.write_interval:
+            self.flush()
+
+    def flush(self):
+        with sqlite_write_lock():
+            SyncProgress.objects.filter(key=self.key).update(
+                status=self.status,
+                message=self.message,
+                counters=self.counters,
+                updated_at=timezone.now(),
+            )
+        self._last_write = time.monotonic()
+
+    def finish(self, status, message):
+        self.update(message=message, status=status, force=True)
+
+    def should_stop(self):
+        """Whether a stop was requested, re-read from the database at most every stop_check_interval."""
+        if not self._stopped and time.monotonic() - self._last_stop_check >= self.stop_check_interval:
+            self._stopped = SyncProgress.objects.filter(key=self.key, should_stop=True).exists()
+            self._last_stop_check = time.monotonic()
+        return self._stopped
+
+def get_progress(key):
+    """
+    Current progress for a sync key.
+
+    Returns:
+        dict: status, message, progress (the counters) and should_stop
+    """
+    row = SyncProgress.objects.filter(key=key).first()
+    if row is None:
+        return {'status': 'idle', 'message': '', 'progress': {}, 'should_stop': False}
+    return {
+        'status': row.status,
+        'message': row.message,
+        'progress': row.counters,
+        'should_stop': row.should_stop,
+        'started_at': row.started_at.isoformat() if row.started_at else None,
+        'updated_at': row.updated_at.isoformat(),
+    }
+
+def latest_progress_key(prefix):
+    """Key of the most recently updated sync whose key starts with prefix, or None."""
+    return (
+        SyncProgress.objects.filter(key__startswith=prefix)
+        .order_by('-updated_at')
+        .values_list('key', flat=True)
+        .first()
+    )
+
+def reset_progress(key, status, message=''):
+    """Replace a sync key's progress with a fresh status, e.g. 'queued' when its job is enqueued."""
+    now = timezone.now()
+    with sqlite_write_lock():
+        SyncProgress.objects.update_or_create(
+            key=key,
+            defaults={
+                'status': status,
+                'message': message,
+                'counters': {},
+                'should_stop': False,
+                'started_at': None,
+                'updated_at': now,
+            }
+        )
+
+def request_stop(key):
+    """Ask the sync running under this key to stop; every worker sees the flag."""
+    SyncProgress.objects.update_or_create(key=key, defaults={'should_stop': True, 'updated_at': timezone.now()})
+    logger.info(f"Stop requested for {key}")
@@ -0,0 +1,115 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls at least 1/rate seconds apart.
+
+    A single limiter is shared by every thread talking to the same remote
+    host, so parallel fetches never exceed the configured request rate.
+    """
+
+    def __init__(self, rate):
+        """
+        Args:
+            rate (float): Maximum requests per second (0 or None disables limiting)
+        """
+        self.interval = 1.0 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+
+    def wait(self):
+        """Block until the next request is allowed to go out."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_allowed - now
+            self._next_allowed = max(now, self._next_allowed) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose quota can be adjusted at runtime.
+
+    Holds up to `capacity` requests and refills at capacity/interval per
+    second. update() lets the caller feed in the quota the remote reports
+    (limit, remaining, window), and pause() stops all requests for a while
+    after the remote says the quota is exhausted.
+    """
+
+    def __init__(self, capacity, interval):
+        """
+        Args:
+            capacity (int): Requests allowed per interval
+            interval (float): Length of the quota window in seconds
+        """
+        self.capacity = float(capacity)
+        self.interval = float(interval)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.capacity / self.interval
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent, then consume a token."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = max(self._paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+
+    def update(self, limit=None, remaining=None, interval=None):
+        """
+        Apply the quota reported by the remote.
+
+        Args:
+            limit (int): Requests allowed per window
+            remaining (int): Requests left in the current window
+            interval (float): Window length in seconds
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if limit:
+                self.capacity = float(limit)
+            if interval:
+                self.interval = float(interval)
+            if remaining is not None:
+                # The remote's count includes requests from other clients and
+                # processes, so it can only lower what we think is left
+                self.tokens = min(self.tokens, float(remaining))
+        if remaining is not None and remaining <= 0:
+            self.pause(self.interval)
+
+    def pause(self, seconds):
+        """Hold all requests for `seconds`."""
+        with self._lock:
+            self.tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class RateLimiterRegistry:
+    """Lazily creates one limiter per key (e.g. per account or location)."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._limiters:
+                self._limiters[key] = self.factory()
+            return self._limiters[key]
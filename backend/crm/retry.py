@@ -0,0 +1,237 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from requests.exceptions import RequestException
+
+logger = logging.getLogger(__name__)
+
+# Status codes that mean "try again later" rather than "your request is wrong"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class CircuitOpenError(RequestException):
+    """Raised instead of sending a request while a host's circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Fails fast while a remote host is down.
+
+    After `failure_threshold` consecutive failures the breaker opens and every
+    call is rejected for `reset_timeout` seconds. The first call after that is
+    let through as a trial: success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        """Whether a request may be sent now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # Only one trial at a time; a trial that never reported back expires
+            if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+                return False
+            self._trial_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_started = None
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+class RetryBudget:
+    """Caps how many retries may be spent on one host within a sliding window."""
+
+    def __init__(self, max_retries=20, window=60):
+        self.max_retries = max_retries
+        self.window = window
+        self._spent = deque()
+        self._lock = threading.Lock()
+
+    def try_spend(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._spent and now - self._spent[0] > self.window:
+                self._spent.popleft()
+            if len(self._spent) >= self.max_retries:
+                return False
+            self._spent.append(now)
+            return True
+
+class RetryPolicy:
+    """
+    Reusable retry policy for HTTP clients.
+
+    Retries network errors and retryable status codes with exponential backoff
+    and full jitter, honours `Retry-After`, limits retries per host with a
+    RetryBudget, and keeps a CircuitBreaker per host so callers fail fast
+    while the remote is down.
+    """
+
+    def __init__(self, max_retries=3, base_delay=1, max_delay=30, jitter=True,
+                 retry_statuses=RETRY_STATUS_CODES, budget=20, budget_window=60,
+                 failure_threshold=5, reset_timeout=30):
+        """
+        Args:
+            max_retries (int): Retries per call after the first attempt
+            base_delay (float): Backoff for the first retry in seconds
+            max_delay (float): Upper bound for a single backoff, including Retry-After
+            jitter (bool): Randomise backoffs to avoid synchronised retries
+            retry_statuses (tuple): Response status codes that are retried
+            budget (int): Maximum retries per host within budget_window seconds
+            budget_window (int): Length of the retry budget window in seconds
+            failure_threshold (int): Consecutive failures that open a host's circuit
+            reset_timeout (int): Seconds an open circuit rejects calls
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = tuple(retry_statuses)
+        self.budget = budget
+        self.budget_window = budget_window
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def _budget(self, host):
+        with self._lock:
+            if host not in self._budgets:
+                self._budgets[host] = RetryBudget(self.budget, self.budget_window)
+            return self._budgets[host]
+
+    def backoff(self, attempt):
+        """Exponential backoff for the given retry attempt (1-based)."""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    @staticmethod
+    def retry_after(response):
+        """Seconds requested by a Retry-After header, or None."""
+        value = response.headers.get('Retry-After') if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _can_retry(self, host, attempt):
+        if attempt >= self.max_retries:
+            return False
+        if not self._budget(host).try_spend():
+            logger.warning(f"Retry budget for {host} exhausted, not retrying")
+            return False
+        return True
+
+    def request(self, host, send):
+        """
+        Send a request through the policy.
+
+        Args:
+            host (str): Key for the circuit breaker and retry budget
+            send (callable): Sends the request and returns a requests.Response
+
+        Returns:
+            requests.Response: The first non-retryable response, or the last
+            retryable one once retries are exhausted
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open
+            RequestException: If the last attempt failed with a network error
+        """
+        breaker = self.breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {host}, failing fast")
+            try:
+                response = send()
+            except RequestException as e:
+                breaker.record_failure()
+                if not self._can_retry(host, attempt):
+                    raise
+                attempt += 1
+                delay = self.backoff(attempt)
+                logger.warning(f"Request to {host} failed, retrying in {delay:.1f}s ({attempt}/{self.max_retries}): {str(e)}")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in self.retry_statuses:
+                breaker.record_success()
+                return response
+
+            # Throttling means the host is up; only server errors count toward the breaker
+            if response.status_code == 429:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+            retry_after = self.retry_after(response)
+            if retry_after is not None and retry_after > self.max_delay:
+                logger.warning(f"{host} asked to retry after {retry_after:.0f}s, giving up")
+                return response
+            if not self._can_retry(host, attempt):
+                return response
+            attempt += 1
+            delay = retry_after if retry_after is not None else self.backoff(attempt)
+            logger.warning(f"{host} returned {response.status_code}, retrying in {delay:.1f}s ({attempt}/{self.max_retries})")
+            time.sleep(delay)
+
+    def call(self, func, *args, host='default', **kwargs):
+        """Call a function, retrying it on network errors."""
+        breaker = self.breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {host}, failing fast")
+            try:
+                result = func(*args, **kwargs)
+            except RequestException as e:
+                breaker.record_failure()
+                if not self._can_retry(host, attempt):
+                    raise
+                attempt += 1
+                delay = self.backoff(attempt)
+                logger.warning(f"Request failed, retrying in {delay:.1f}s ({attempt}/{self.max_retries}): {str(e)}")
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
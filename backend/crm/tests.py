@@ -1,3 +1,239 @@
+import datetime
+from unittest import mock
 from django.test import TestCase
+from django.utils import timezone
+from requests import Response
+from requests.exceptions import ConnectionError
+from . import identity
+from .identity import ContactIdentityIndex
+from .jobs import claim_job, enqueue, requeue_stale_jobs
+from .models import Contact, SyncJob
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from .woo_sync import process_customer_batch
 
-# Create your tests here.
+def woo_customer(customer_id, email, first_name='Jane', phone='(555) 123-4567'):
+    """A WooCommerce customer payload with the fields the sync reads."""
+    return {
+        'id': customer_id,
+        'email': email,
+        'first_name': first_name,
+        'last_name': 'Doe',
+        'role': 'customer',
+        'billing': {'phone': phone, 'address_1': '1 Main St', 'city': 'Springfield', 'state': 'IL', 'postcode': '62701'},
+        'date_modified_gmt': '2024-01-01T00:00:00',
+    }
+
+def response(status_code, headers=None):
+    result = Response()
+    result.status_code = status_code
+    result.headers.update(headers or {})
+    return result
+
+class ProcessCustomerBatchTests(TestCase):
+    def setUp(self):
+        # The shared index outlives each test's rolled-back transaction
+        identity._shared_index = None
+
+    def test_creates_and_updates_contacts(self):
+        Contact.objects.create(email='Existing@Example.com', first_name='Old')
+        failures = process_customer_batch([
+            woo_customer(1, 'new@example.com'),
+            woo_customer(2, 'existing@example.com', first_name='Updated'),
+        ])
+        self.assertEqual(failures, [])
+        self.assertEqual(Contact.objects.count(), 2)
+        existing = Contact.objects.get(email_key='existing@example.com')
+        self.assertEqual(existing.first_name, 'Updated')
+        self.assertEqual(existing.woo_customer_id, 2)
+        self.assertEqual(existing.primary_source, 'woo')
+        self.assertEqual(Contact.objects.get(woo_customer_id=1).normalized_phone, '+15551234567')
+
+    def test_duplicate_emails_in_one_page(self):
+        failures = process_customer_batch([
+            woo_customer(1, 'dup@example.com', first_name='First'),
+            woo_customer(2, ' DUP@example.com', first_name='Second'),
+        ])
+        self.assertEqual(failures, [])
+        # The repeat is applied after the batch instead of colliding with it
+        contact = Contact.objects.get(email_key='dup@example.com')
+        self.assertEqual(Contact.objects.count(), 1)
+        self.assertEqual(contact.first_name, 'Second')
+
+    def test_unchanged_customers_are_skipped(self):
+        customer = woo_customer(1, 'same@example.com')
+        process_customer_batch([customer])
+        before = Contact.objects.get(woo_customer_id=1)
+        self.assertEqual(process_customer_batch([dict(customer)]), [])
+        after = Contact.objects.get(woo_customer_id=1)
+        self.assertEqual(after.updated_at, before.updated_at)
+        self.assertEqual(after.woo_last_sync, before.woo_last_sync)
+
+    def test_customer_without_email_fails_alone(self):
+        bad = woo_customer(1, '  ')
+        failures = process_customer_batch([bad, woo_customer(2, 'good@example.com')])
+        self.assertEqual([customer for customer, _ in failures], [bad])
+        self.assertTrue(Contact.objects.filter(woo_customer_id=2).exists())
+
+class ContactIdentityIndexTests(TestCase):
+    def test_full_refresh_drops_deleted_contacts(self):
+        contact = Contact.objects.create(email='gone@example.com', ghl_contact_id='g1')
+        contact_id = contact.id
+        index = ContactIdentityIndex().refresh(full=True)
+        self.assertEqual(index.match(ghl_id='g1'), contact_id)
+        contact.delete()
+        index.refresh()
+        # An incremental refresh only sees rows that still exist
+        self.assertEqual(index.match(ghl_id='g1'), contact_id)
+        index.refresh(full=True)
+        self.assertIsNone(index.match(ghl_id='g1'))
+
+    def test_incremental_refresh_picks_up_changes(self):
+        contact = Contact.objects.create(email='old@example.com', phone='555-123-4567')
+        index = ContactIdentityIndex().refresh(full=True)
+        contact.email = 'new@example.com'
+        contact.save()
+        added = Contact.objects.create(email='added@example.com')
+        index.refresh()
+        self.assertEqual(index.match(email='NEW@example.com'), contact.id)
+        self.assertIsNone(index.match(email='old@example.com'))
+        self.assertEqual(index.match(email='added@example.com'), added.id)
+        self.assertEqual(index.match(phone='+1 (555) 123-4567'), contact.id)
+
+    def test_match_order(self):
+        by_phone = Contact.objects.create(email='phone@example.com', phone='5551234567')
+        by_email = Contact.objects.create(email='email@example.com')
+        index = ContactIdentityIndex().refresh(full=True)
+        self.assertEqual(index.match(email='email@example.com', phone='5551234567'), by_phone.id)
+        self.assertEqual(index.match(email='email@example.com', phone='5551234567', order=('email', 'phone')), by_email.id)
+
+    def test_load_missing(self):
+        index = ContactIdentityIndex().refresh(full=True)
+        # Committed after the index was loaded, but stamped as if before it
+        contact = Contact.objects.create(email='late@example.com', ghl_contact_id='g2', phone='5550001111')
+        Contact.objects.filter(id=contact.id).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        index.refresh()
+        self.assertIsNone(index.match(ghl_id='g2'))
+        self.assertEqual(index.load_missing([{'ghl_id': 'g2'}, {'email': 'late@example.com'}]), 1)
+        self.assertEqual(index.match(ghl_id='g2'), contact.id)
+        self.assertEqual(index.match(phone='555-000-1111'), contact.id)
+        # Keys the index already holds don't cost a query
+        with self.assertNumQueries(0):
+            self.assertEqual(index.load_missing([{'ghl_id': 'g2', 'email': 'late@example.com'}]), 0)
+
+    def test_raw_phone_in_normalized_column(self):
+        contact = Contact.objects.create(email='raw@example.com', phone='(555) 222-3333')
+        Contact.objects.filter(id=contact.id).update(normalized_phone='(555) 222-3333')
+        index = ContactIdentityIndex().refresh(full=True)
+        self.assertEqual(index.match(phone='+15552223333'), contact.id)
+
+class CircuitBreakerTests(TestCase):
+    @mock.patch('crm.retry.time.monotonic')
+    def test_opens_and_allows_one_trial(self, monotonic):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        monotonic.return_value = 100
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        monotonic.return_value = 110
+        self.assertFalse(breaker.allow())
+        monotonic.return_value = 131
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+    @mock.patch('crm.retry.time.monotonic', return_value=100)
+    def test_failed_trial_reopens(self, monotonic):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        monotonic.return_value = 131
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+@mock.patch('crm.retry.time.sleep')
+class RetryPolicyTests(TestCase):
+    def policy(self, **kwargs):
+        options = {'max_retries': 3, 'base_delay': 1, 'jitter': False, 'failure_threshold': 10}
+        options.update(kwargs)
+        return RetryPolicy(**options)
+
+    def test_retries_retryable_statuses(self, sleep):
+        responses = iter([response(503), response(502), response(200)])
+        result = self.policy().request('host', lambda: next(responses))
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1, 2])
+
+    def test_does_not_retry_client_errors(self, sleep):
+        send = mock.Mock(return_value=response(404))
+        self.assertEqual(self.policy().request('host', send).status_code, 404)
+        self.assertEqual(send.call_count, 1)
+
+    def test_honours_retry_after(self, sleep):
+        responses = iter([response(429, {'Retry-After': '7'}), response(200)])
+        self.policy().request('host', lambda: next(responses))
+        sleep.assert_called_once_with(7.0)
+
+    def test_gives_up_when_retry_after_exceeds_max_delay(self, sleep):
+        send = mock.Mock(return_value=response(429, {'Retry-After': '600'}))
+        self.assertEqual(self.policy(max_delay=30).request('host', send).status_code, 429)
+        self.assertEqual(send.call_count, 1)
+
+    def test_raises_network_error_after_max_retries(self, sleep):
+        send = mock.Mock(side_effect=ConnectionError('down'))
+        with self.assertRaises(ConnectionError):
+            self.policy(max_retries=2).request('host', send)
+        self.assertEqual(send.call_count, 3)
+
+    def test_retry_budget_is_shared_per_host(self, sleep):
+        policy = self.policy(budget=1)
+        send = mock.Mock(return_value=response(503))
+        policy.request('host', send)
+        policy.request('host', send)
+        # One retry for the whole window: two calls cost three requests
+        self.assertEqual(send.call_count, 3)
+
+    def test_open_circuit_fails_fast(self, sleep):
+        policy = self.policy(max_retries=0, failure_threshold=1)
+        send = mock.Mock(side_effect=ConnectionError('down'))
+        with self.assertRaises(ConnectionError):
+            policy.request('host', send)
+        with self.assertRaises(CircuitOpenError):
+            policy.request('host', send)
+        self.assertEqual(send.call_count, 1)
+        # Other hosts have their own breaker
+        self.assertEqual(policy.request('other', lambda: response(200)).status_code, 200)
+
+class JobQueueTests(TestCase):
+    def test_claim_job_takes_due_jobs_in_order(self):
+        first = enqueue('woo_update_members', {'emails': ['a@example.com']})
+        second = enqueue('woo_update_members', {'emails': ['b@example.com']})
+        enqueue('woo_update_members', run_after=timezone.now() + datetime.timedelta(hours=1))
+        claimed = claim_job('worker-1')
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.status, 'running')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertEqual(claimed.locked_by, 'worker-1')
+        self.assertIsNotNone(claimed.locked_at)
+        self.assertEqual(claim_job('worker-2').id, second.id)
+        self.assertIsNone(claim_job('worker-3'))
+
+    def test_requeue_stale_jobs(self):
+        stale = timezone.now() - datetime.timedelta(seconds=600)
+        retryable = SyncJob.objects.create(job_type='woo_sync', status='running', attempts=1,
+                                           max_attempts=3, locked_by='dead', locked_at=stale)
+        exhausted = SyncJob.objects.create(job_type='woo_sync', status='running', attempts=3,
+                                           max_attempts=3, locked_by='dead', locked_at=stale)
+        alive = SyncJob.objects.create(job_type='woo_sync', status='running', attempts=1,
+                                       max_attempts=3, locked_by='alive', locked_at=timezone.now())
+        self.assertEqual(requeue_stale_jobs(stale_after=300), 1)
+        retryable.refresh_from_db()
+        exhausted.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((retryable.status, retryable.locked_by, retryable.locked_at), ('queued', '', None))
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertEqual(alive.status, 'running')
+        self.assertEqual(claim_job('worker-1').id, retryable.id)
@@ -13,6 +13,7 @@ urlpatterns = [
     path('sync/', views.sync_woocommerce_data, name='sync_woocommerce_data'),
     path('sync/status/', views.get_sync_status, name='get_sync_status'),
     path('sync/stop/', views.stop_sync, name='stop_sync'),
+    path('jobs/<uuid:job_id>/', views.get_job_status, name='get_job_status'),
     path('sync/update-contact/', views.update_specific_contact, name='update_specific_contact'),
     path('sync/update-member-contacts/', views.update_member_contacts, name='update_member_contacts'),
     path('sync/update-contact-form/', views.update_contact_form, name='update_contact_form'),
@@ -24,6 +25,7 @@ urlpatterns = [
     path('oauth/refresh/<uuid:token_id>/', ghl_oauth.refresh_token_view, name='ghl_oauth_refresh'),
     path('oauth/location/submit/', ghl_oauth.location_submit_view, name='ghl_oauth_location_submit'),
     path('sync/ghl/', views.sync_gohighlevel_data, name='sync_gohighlevel_data'),
+    path('sync/ghl/all/', views.sync_all_gohighlevel_locations, name='sync_all_gohighlevel_locations'),
     path('sync/ghl/status/', views.get_ghl_sync_status, name='get_ghl_sync_status'),
     path('dashboard/', views.ghl_dashboard_view, name='ghl_dashboard'),
     
@@ -1,5 +1,15 @@
+import contextlib
+import hashlib
+import json
+import threading
+from django.db import connection
 from .models import SystemLog
 
+# SQLite has a single writer and fails a transaction outright (rather than
+# waiting) when two of them try to upgrade from reading to writing at once;
+# re-entrant so writes nested in a locked transaction don't deadlock
+_sqlite_write_lock = threading.RLock()
+
 def log_system_event(message, type='system', status='info', details=None):
     """
     Utility function to log system events.
@@ -13,9 +23,40 @@ def log_system_event(message, type='system', status='info', details=None):
     Returns:
         SystemLog: The created log entry
     """
-    return SystemLog.objects.create(
-        message=message,
-        type=type,
-        status=status,
-        details=details
-    )
+    with sqlite_write_lock():
+        return SystemLog.objects.create(
+            message=message,
+            type=type,
+            status=status,
+            details=details
+        )
+
+def payload_fingerprint(payload):
+    """
+    Stable hash of a JSON payload, used to detect unchanged upstream records.
+    
+    Keys are sorted and whitespace is dropped before hashing so the same data
+    always produces the same fingerprint regardless of key order.
+    
+    Args:
+        payload: Any JSON-serializable value
+    
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def sqlite_write_lock():
+    """
+    Serialize writes between threads on SQLite.
+
+    Other databases lock rows themselves, so this is a no-op there. Use it
+    around transactions, and around writes made while such transactions may
+    be running, in code that threads of one process run concurrently;
+    otherwise SQLite's busy timeout can expire while other threads keep
+    taking the database.
+    """
+    if connection.vendor == 'sqlite':
+        return _sqlite_write_lock
+    return contextlib.nullcontext()
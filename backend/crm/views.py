@@ -5,11 +5,18 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
-from .models import Contact, Order, Product, OAuth2Token, TokenRequestLog, SystemLog, SyncState, Appointment, AppointmentWebhookLog
+from .models import Contact, Order, Product, TokenRequestLog, SystemLog, SyncState, SyncJob, Appointment, AppointmentWebhookLog
 from .serializers import ContactSerializer, OrderSerializer, ProductSerializer
-from .woocommerce import WooCommerceAPI
-from .woo_sync import sync_woocommerce_contacts, sync_woocommerce_orders, sync_woocommerce_products
-from .ghl_sync import sync_all_ghl_contacts, sync_updated_ghl_contacts
+from .woocommerce import get_woocommerce_api
+from .woo_sync import (
+    sync_woocommerce_contacts, sync_woocommerce_orders, sync_woocommerce_products,
+    process_customer, get_woo_customer_index, WOO_SYNC_TYPES
+)
+from .jobs import enqueue, cancel_queued_jobs, find_active_job, job_to_dict
+from .progress import WOO_SYNC_KEY, ghl_sync_key, get_progress, latest_progress_key, request_stop, reset_progress
+from .ghl_sync import sync_updated_ghl_contacts
+from .ghl_oauth import token_status_summaries
+from .identity import get_identity_index, normalize_email
 import logging
 import json
 from django.http import JsonResponse
@@ -25,26 +32,6 @@ import os
 
 logger = logging.getLogger(__name__)
 
-sync_status = {
-    'status': 'idle',
-    'message': '',
-    'progress': {'current': 0, 'total': 0, 'type': 'products'},
-    'should_stop': False
-}
-
-# Global variable to track sync status
-ghl_sync_status = {
-    'running': False,
-    'progress': 0,
-    'total': 0,
-    'completed': 0,
-    'errors': 0,
-    'message': ''
-}
-
-# Global variable to control sync process
-stop_sync_flag = False
-
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
@@ -116,111 +103,15 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
         return queryset
 
-def process_product(product):
-    Product.objects.update_or_create(
-        woo_product_id=product['id'],
-        defaults={
-            'name': product['name'],
-            'description': product['description'],
-            'price': float(product['price'] or 0),
-            'regular_price': float(product.get('regular_price') or 0),
-            'sale_price': float(product.get('sale_price') or 0),
-            'status': product['status'],
-            'stock_status': product.get('stock_status', 'instock'),
-            'stock_quantity': product.get('stock_quantity', 0),
-            'categories': [cat['name'] for cat in product.get('categories', [])],
-            'images': [img['src'] for img in product.get('images', [])],
-        }
-    )
-
-def process_customer(customer):
-    """Process a customer from WooCommerce and create/update in our database."""
-    try:
-        # First, try to find an existing contact by email (case-insensitive)
-        email = customer['email'].lower()
-        contact = Contact.objects.filter(email__iexact=email).first()
-        
-        # Get user role information for logging
-        role = "unknown"
-        if 'role' in customer:
-            role = customer['role']
-        
-        logger.info(f"Processing customer with email: {email}, role: {role}")
-        
-        # Log member processing to SystemLog for visibility
-        if role and role != 'customer':
-            from .utils import log_system_event
-            log_system_event(
-                message=f"Processing non-customer user: {email} with role: {role}",
-                type='sync',
-                status='info',
-                details={
-                    'email': email,
-                    'role': role,
-                    'woo_id': customer.get('id')
-                }
-            )
-            
-        if contact:
-            logger.info(f"Found existing contact: ID={contact.id}, WooID={contact.woo_customer_id}, Source={contact.primary_source}")
-        else:
-            logger.info(f"No existing contact found for email: {email}")
-        
-        # Prepare the data to update
-        contact_data = {
-            'woo_customer_id': customer['id'],
-            'first_name': customer['first_name'],
-            'last_name': customer['last_name'],
-            'email': customer['email'],
-            'phone': customer['billing'].get('phone', ''),
-            'billing_address': customer['billing'].get('address_1', ''),
-            'billing_city': customer['billing'].get('city', ''),
-            'billing_state': customer['billing'].get('state', ''),
-            'billing_postcode': customer['billing'].get('postcode', ''),
-            'woo_data': customer,
-            'woo_last_sync': timezone.now()
-        }
-        
-        # If contact exists, update it
-        if contact:
-            # Only set primary_source to 'woo' if it's currently 'crm'
-            if contact.primary_source == 'crm':
-                contact_data['primary_source'] = 'woo'
-                logger.info(f"Changing primary source from 'crm' to 'woo'")
-                
-            # Update the contact with WooCommerce data
-            for key, value in contact_data.items():
-                setattr(contact, key, value)
-            
-            # Save the contact
-            try:
-                contact.save()
-                logger.info(f"Updated existing contact with email {email} from WooCommerce (ID: {customer['id']})")
-                return contact
-            except Exception as save_error:
-                logger.error(f"Error saving contact {contact.id}: {str(save_error)}")
-                raise
-        else:
-            # Create a new contact
-            contact_data['primary_source'] = 'woo'  # Set primary source for new contacts
-            try:
-                contact = Contact.objects.create(**contact_data)
-                logger.info(f"Created new contact with email {email} from WooCommerce (ID: {customer['id']})")
-                return contact
-            except Exception as create_error:
-                logger.error(f"Error creating contact with email {email}: {str(create_error)}")
-                raise
-            
-    except Exception as e:
-        logger.error(f"Error processing customer {customer.get('id', 'unknown')}: {str(e)}")
-        logger.exception("Full exception details:")
-        raise
-
 @api_view(['POST'])
 def stop_sync(request):
     """Stop the sync process."""
-    sync_status['should_stop'] = True
-    return JsonResponse({'message': 'Sync process will be stopped'})
+    # A sync that hasn't started yet is simply dropped from the queue
+    cancelled = cancel_queued_jobs('woo_sync')
+    if cancelled and not find_active_job('woo_sync'):
+        reset_progress(WOO_SYNC_KEY, 'stopped', 'Sync cancelled before it started')
+    request_stop(WOO_SYNC_KEY)
+    return JsonResponse({'message': 'Sync process will be stopped', 'cancelled_jobs': cancelled})
 
 @api_view(['POST'])
 def update_specific_contact(request):
@@ -230,21 +121,19 @@ def update_specific_contact(request):
         return JsonResponse({'error': 'Email is required'}, status=400)
     
     # Find the contact
-    contact = Contact.objects.filter(email__iexact=email).first()
+    contact = Contact.objects.filter(email_key=normalize_email(email)).first()
     if not contact:
         return JsonResponse({'error': f'No contact found with email {email}'}, status=404)
     
     # Find the WooCommerce customer
     try:
-        wc = WooCommerceAPI()
-        customers = wc.get_all_customers()
-        matching = [c for c in customers if c.get('email', '').lower() == email.lower()]
+        wc = get_woocommerce_api()
+        customer = wc.find_customer_by_email(email, get_woo_customer_index([email]).get(email.strip().lower()))
         
-        if not matching:
+        if not customer:
             return JsonResponse({'error': f'No WooCommerce customer found with email {email}'}, status=404)
         
         # Process the customer
-        customer = matching[0]
         updated_contact = process_customer(customer)
         
         return JsonResponse({
@@ -260,92 +149,21 @@ def update_specific_contact(request):
 
 @api_view(['POST'])
 def update_member_contacts(request):
-    """Manually update contacts that have 'member' role instead of 'customer' role."""
+    """Queue an update of contacts that have 'member' role instead of 'customer' role."""
     try:
         # Get the emails to check
         emails = request.data.get('emails', [])
         if not emails:
             return JsonResponse({'error': 'At least one email is required'}, status=400)
         
-        logger.info(f"Starting update_member_contacts for {len(emails)} emails")
-        
-        # Initialize WooCommerce API with a shorter timeout
-        wc = WooCommerceAPI()
-        
-        # Log the request
-        from .utils import log_system_event
-        log_system_event(
-            message=f"Processing {len(emails)} contacts in update_member_contacts",
-            type='sync',
-            status='info',
-            details={'emails': emails}
-        )
-        
-        # Get all customers - this might be slow, let's add a timeout
-        try:
-            logger.info("Fetching all customers from WooCommerce")
-            customers = wc.get_all_customers()
-            logger.info(f"Retrieved {len(customers)} customers from WooCommerce")
-        except Exception as e:
-            logger.error(f"Error fetching customers: {str(e)}")
-            return JsonResponse({
-                'error': f'Error fetching customers: {str(e)}',
-                'message': 'The WooCommerce API request timed out. Try with fewer emails or try again later.'
-            }, status=500)
-        
-        results = []
-        for email in emails:
-            # Find matching WooCommerce user
-            logger.info(f"Looking for customer with email: {email}")
-            matching = [c for c in customers if c.get('email', '').lower() == email.lower()]
-            
-            if not matching:
-                logger.warning(f"No WooCommerce user found with email: {email}")
-                results.append({
-                    'email': email,
-                    'status': 'error',
-                    'message': 'No WooCommerce user found with this email'
-                })
-                continue
-            
-            # Process the customer
-            customer = matching[0]
-            role = customer.get('role', 'unknown')
-            logger.info(f"Found customer with email {email}, role: {role}")
-            
-            try:
-                updated_contact = process_customer(customer)
-                results.append({
-                    'email': email,
-                    'status': 'success',
-                    'message': f'Contact updated successfully',
-                    'role': role,
-                    'contact_id': str(updated_contact.id),
-                    'woo_customer_id': updated_contact.woo_customer_id,
-                    'primary_source': updated_contact.primary_source
-                })
-                logger.info(f"Successfully updated contact with email: {email}")
-            except Exception as e:
-                logger.error(f"Error updating contact with email {email}: {str(e)}")
-                results.append({
-                    'email': email,
-                    'status': 'error',
-                    'message': f'Error updating contact: {str(e)}',
-                    'role': role
-                })
-        
-        # Log completion
-        log_system_event(
-            message=f"Completed processing {len(emails)} contacts in update_member_contacts",
-            type='sync',
-            status='success',
-            details={'results': results}
-        )
+        job = enqueue('woo_update_members', {'emails': emails})
+        logger.info(f"Queued update_member_contacts job {job.id} for {len(emails)} emails")
         
         return JsonResponse({
-            'message': f'Processed {len(results)} contacts',
-            'results': results
-        })
+            'message': f'Queued update of {len(emails)} contacts',
+            'job_id': str(job.id),
+            'status_url': reverse('get_job_status', args=[job.id])
+        }, status=202)
     except Exception as e:
         logger.error(f"Error in update_member_contacts: {str(e)}")
         logger.exception("Full exception details:")
@@ -355,12 +173,6 @@ def update_member_contacts(request):
 def sync_woocommerce_data(request):
     """Sync data from WooCommerce."""
     try:
-        # Reset stop flag
-        sync_status['should_stop'] = False
-        
-        # Initialize WooCommerce API
-        wc = WooCommerceAPI()
-        
         # Get sync type from request (either from GET or POST)
         if request.method == 'GET':
             sync_type = request.GET.get('type')
@@ -372,279 +184,44 @@ def sync_woocommerce_data(request):
                     'site_header': 'DoctorsStudio CRM Admin',
                     'has_permission': True,
                     'sync_type': sync_type,
-                    'valid_types': ['customers', 'products', 'orders'],
+                    'valid_types': WOO_SYNC_TYPES,
                 })
+            incremental = request.GET.get('incremental', 'false') == 'true'
         else:
             sync_type = request.data.get('type')
+            incremental = str(request.data.get('incremental', 'false')).lower() == 'true'
         
-        logger.info(f"Received sync request with type: {sync_type}")
+        logger.info(f"Received sync request with type: {sync_type} (incremental: {incremental})")
         
         # Validate sync type
-        valid_types = ['customers', 'products', 'orders']
-        if sync_type and sync_type not in valid_types:
+        if sync_type and sync_type not in WOO_SYNC_TYPES:
             logger.error(f"Invalid sync type received: {sync_type}")
-            return JsonResponse({'error': f'Invalid sync type. Must be one of: {", ".join(valid_types)}'}, status=400)
+            return JsonResponse({'error': f'Invalid sync type. Must be one of: {", ".join(WOO_SYNC_TYPES)}'}, status=400)
         
         # If no type specified, sync all
-        if sync_type:
-            sync_types = [sync_type]
-            logger.info(f"Will sync only: {sync_type}")
-        else:
-            sync_types = valid_types
-            logger.info("No type specified, will sync all types")
-            
+        sync_types = [sync_type] if sync_type else WOO_SYNC_TYPES
         logger.info(f"Will sync the following types: {sync_types}")
-            
-        for current_type in sync_types:
-            logger.info(f"Starting sync for type: {current_type}")
-            
-            if sync_status['should_stop']:
-                sync_status['status'] = 'stopped'
-                sync_status['message'] = 'Sync process stopped by user'
-                return JsonResponse({'message': 'Sync process stopped', 'status': 'stopped'})
-                
-            if current_type == 'customers':
-                # Sync customers
-                sync_status['status'] = 'in_progress'
-                sync_status['message'] = 'Starting customer sync...'
-                sync_status['progress'] = {'current': 0, 'total': 0, 'type': 'customers', 'success': 0, 'errors': 0}
-                
-                logger.info("Starting WooCommerce customer sync")
-                
-                try:
-                    # Use the new get_all_customers method to fetch all customers with pagination
-                    customers = wc.get_all_customers()
-                    
-                    if customers:
-                        total_customers = len(customers)
-                        sync_status['progress']['total'] = total_customers
-                        processed_count = 0
-                        success_count = 0
-                        error_count = 0
-                        
-                        for customer in customers:
-                            if sync_status['should_stop']:
-                                sync_status['status'] = 'stopped'
-                                sync_status['message'] = f'Sync process stopped by user. Processed {processed_count}/{total_customers} customers. Success: {success_count}, Errors: {error_count}'
-                                logger.info(f"Sync stopped by user after processing {processed_count}/{total_customers} customers")
-                                return JsonResponse({
-                                    'message': 'Sync process stopped', 
-                                    'status': 'stopped',
-                                    'details': {
-                                        'processed': processed_count,
-                                        'total': total_customers,
-                                        'success': success_count,
-                                        'errors': error_count
-                                    }
-                                })
-                            
-                            try:
-                                process_customer(customer)
-                                processed_count += 1
-                                success_count += 1
-                                sync_status['progress']['current'] = processed_count
-                                sync_status['progress']['success'] = success_count
-                                sync_status['message'] = f'Processing customer {processed_count}/{total_customers}. Success: {success_count}, Errors: {error_count}'
-                                logger.info(f"Processed customer {processed_count}/{total_customers}")
-                            except Exception as e:
-                                processed_count += 1
-                                error_count += 1
-                                sync_status['progress']['current'] = processed_count
-                                sync_status['progress']['errors'] = error_count
-                                error_msg = f"Error processing customer {customer.get('id', 'unknown')}: {str(e)}"
-                                logger.error(error_msg)
-                                # Log to SystemLog model for admin visibility
-                                from .utils import log_system_event
-                                log_system_event(
-                                    message=error_msg,
-                                    type='sync',
-                                    status='error',
-                                    details={
-                                        'customer_id': customer.get('id'),
-                                        'error': str(e),
-                                        'customer_email': customer.get('email', 'unknown')
-                                    }
-                                )
-                        
-                        logger.info(f"Finished processing {processed_count} customers. Success: {success_count}, Errors: {error_count}")
-                        sync_status['message'] = f'Completed customer sync. Processed: {processed_count}, Success: {success_count}, Errors: {error_count}'
-                    else:
-                        sync_status['message'] = 'No customers found to sync'
-                        logger.warning("No customers found to sync")
-                except Exception as e:
-                    error_msg = f"Error fetching customers: {str(e)}"
-                    sync_status['message'] = error_msg
-                    logger.error(error_msg)
-                    from .utils import log_system_event
-                    log_system_event(
-                        message=error_msg,
-                        type='sync',
-                        status='error',
-                        details={'error': str(e)}
-                    )
-            
-            elif current_type == 'products':
-                # Sync products
-                sync_status['status'] = 'in_progress'
-                sync_status['message'] = 'Starting product sync...'
-                sync_status['progress'] = {'current': 0, 'total': 0, 'type': 'products', 'success': 0, 'errors': 0}
-                
-                logger.info("Starting WooCommerce product sync")
-                
-                try:
-                    # Get products with pagination
-                    products_result = wc.get_products()
-                    
-                    if products_result and 'data' in products_result:
-                        products = products_result['data']
-                        total_products = products_result['total']
-                        sync_status['progress']['total'] = total_products
-                        processed_count = 0
-                        success_count = 0
-                        error_count = 0
-                        
-                        for product in products:
-                            if sync_status['should_stop']:
-                                sync_status['status'] = 'stopped'
-                                sync_status['message'] = f'Sync process stopped by user. Processed {processed_count}/{total_products} products. Success: {success_count}, Errors: {error_count}'
-                                logger.info(f"Sync stopped by user after processing {processed_count}/{total_products} products")
-                                return JsonResponse({
-                                    'message': 'Sync process stopped', 
-                                    'status': 'stopped',
-                                    'details': {
-                                        'processed': processed_count,
-                                        'total': total_products,
-                                        'success': success_count,
-                                        'errors': error_count
-                                    }
-                                })
-                            
-                            try:
-                                process_product(product)
-                                processed_count += 1
-                                success_count += 1
-                                sync_status['progress']['current'] = processed_count
-                                sync_status['progress']['success'] = success_count
-                                sync_status['message'] = f'Processing product {processed_count}/{total_products}. Success: {success_count}, Errors: {error_count}'
-                                logger.info(f"Processed product {processed_count}/{total_products}")
-                            except Exception as e:
-                                processed_count += 1
-                                error_count += 1
-                                sync_status['progress']['current'] = processed_count
-                                sync_status['progress']['errors'] = error_count
-                                error_msg = f"Error processing product {product.get('id', 'unknown')}: {str(e)}"
-                                logger.error(error_msg)
-                                # Log to SystemLog model for admin visibility
-                                from .utils import log_system_event
-                                log_system_event(
-                                    message=error_msg,
-                                    type='sync',
-                                    status='error',
-                                    details={
-                                        'product_id': product.get('id'),
-                                        'error': str(e),
-                                        'product_name': product.get('name', 'unknown')
-                                    }
-                                )
-                        
-                        # Process remaining pages
-                        current_page = 1
-                        total_pages = products_result['total_pages']
-                        
-                        while current_page < total_pages:
-                            current_page += 1
-                            
-                            if sync_status['should_stop']:
-                                sync_status['status'] = 'stopped'
-                                sync_status['message'] = f'Sync process stopped by user. Processed {processed_count}/{total_products} products. Success: {success_count}, Errors: {error_count}'
-                                logger.info(f"Sync stopped by user after processing {processed_count}/{total_products} products")
-                                break
-                                
-                            try:
-                                page_result = wc.get_products(page=current_page)
-                                if page_result and 'data' in page_result:
-                                    page_products = page_result['data']
-                                    
-                                    for product in page_products:
-                                        if sync_status['should_stop']:
-                                            break
-                                            
-                                        try:
-                                            process_product(product)
-                                            processed_count += 1
-                                            success_count += 1
-                                            sync_status['progress']['current'] = processed_count
-                                            sync_status['progress']['success'] = success_count
-                                            sync_status['message'] = f'Processing product {processed_count}/{total_products}. Success: {success_count}, Errors: {error_count}'
-                                            logger.info(f"Processed product {processed_count}/{total_products}")
-                                        except Exception as e:
-                                            processed_count += 1
-                                            error_count += 1
-                                            sync_status['progress']['current'] = processed_count
-                                            sync_status['progress']['errors'] = error_count
-                                            error_msg = f"Error processing product {product.get('id', 'unknown')}: {str(e)}"
-                                            logger.error(error_msg)
-                                            # Log to SystemLog model for admin visibility
-                                            from .utils import log_system_event
-                                            log_system_event(
-                                                message=error_msg,
-                                                type='sync',
-                                                status='error',
-                                                details={
-                                                    'product_id': product.get('id'),
-                                                    'error': str(e),
-                                                    'product_name': product.get('name', 'unknown')
-                                                }
-                                            )
-                            except Exception as e:
-                                error_msg = f"Error fetching product page {current_page}: {str(e)}"
-                                logger.error(error_msg)
-                                from .utils import log_system_event
-                                log_system_event(
-                                    message=error_msg,
-                                    type='sync',
-                                    status='error',
-                                    details={'page': current_page, 'error': str(e)}
-                                )
-                        
-                        logger.info(f"Finished processing {processed_count} products. Success: {success_count}, Errors: {error_count}")
-                        sync_status['message'] = f'Completed product sync. Processed: {processed_count}, Success: {success_count}, Errors: {error_count}'
-                    else:
-                        sync_status['message'] = 'No products found to sync'
-                        logger.warning("No products found to sync")
-                except Exception as e:
-                    error_msg = f"Error fetching products: {str(e)}"
-                    sync_status['message'] = error_msg
-                    logger.error(error_msg)
-                    from .utils import log_system_event
-                    log_system_event(
-                        message=error_msg,
-                        type='sync',
-                        status='error',
-                        details={'error': str(e)}
-                    )
-            
-            elif current_type == 'orders':
-                # Sync orders
-                sync_status['status'] = 'in_progress'
-                sync_status['message'] = 'Starting order sync...'
-                sync_status['progress'] = {'current': 0, 'total': 0, 'type': 'orders'}
-                
-                logger.info("Starting WooCommerce order sync")
-                # This will need to be implemented with actual order sync logic
-                # For now, just a placeholder
-                sync_status['message'] = 'Order sync not implemented yet'
-                logger.warning("Order sync not implemented yet")
-                
-        # If we get here, sync is complete
-        sync_status['status'] = 'done'
-        sync_status['message'] = 'Sync complete!'
-        return JsonResponse({'message': 'Sync complete!', 'status': 'done'})
+        
+        # WooCommerce syncs share one progress row and one set of watermarks,
+        # so only one runs at a time; while one is pending or running, report it
+        job = find_active_job('woo_sync')
+        if job is not None:
+            message = 'A WooCommerce sync is already queued or running'
+        else:
+            # Replace the previous run's final status so pollers don't report it for this job
+            reset_progress(WOO_SYNC_KEY, 'queued', 'Sync queued, waiting for a worker')
+            job = enqueue('woo_sync', {'sync_types': sync_types, 'incremental': incremental}, max_attempts=1)
+            message = 'Sync queued'
+        
+        return JsonResponse({
+            'message': message,
+            'status': job.status,
+            'job_id': str(job.id),
+            'status_url': reverse('get_job_status', args=[job.id])
+        }, status=202)
     
     except Exception as e:
-        sync_status['status'] = 'error'
-        sync_status['message'] = f'Error: {str(e)}'
-        logger.exception(f"Error during sync: {e}")
+        logger.exception(f"Error queueing sync: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
 @api_view(['GET'])
@@ -657,10 +234,10 @@ def get_sync_status(request):
             'site_title': 'DoctorsStudio CRM',
             'site_header': 'DoctorsStudio CRM Admin',
             'has_permission': True,
-            'sync_status': sync_status,
+            'sync_status': get_progress(WOO_SYNC_KEY),
         })
     
-    return JsonResponse(sync_status)
+    return JsonResponse(get_progress(WOO_SYNC_KEY))
 
 @staff_member_required
 def update_contact_form(request):
@@ -717,21 +294,31 @@ def get_ghl_sync_status(request):
     """
     Get the status of the GoHighLevel sync process
     """
-    return JsonResponse(ghl_sync_status)
+    location_id = request.GET.get('location_id')
+    key = ghl_sync_key(location_id) if location_id else latest_progress_key(ghl_sync_key(''))
+    progress = get_progress(key)
+    counters = progress['progress']
+    if progress['status'] == 'done':
+        percent = 100
+    elif counters.get('total'):
+        percent = min(100, round(100 * counters.get('current', 0) / counters['total']))
+    else:
+        percent = 0
+    return JsonResponse({
+        'running': progress['status'] == 'in_progress',
+        'progress': percent,
+        'total': counters.get('total', 0),
+        'completed': counters.get('success', 0),
+        'errors': counters.get('errors', 0),
+        'page': counters.get('page', 0),
+        'message': progress['message']
+    })
 
 @api_view(['POST'])
 def sync_gohighlevel_data(request):
     """
     Sync data from GoHighLevel
     """
-    global ghl_sync_status, stop_sync_flag
-    
-    if ghl_sync_status['running']:
-        return JsonResponse({
-            'status': 'error',
-            'message': 'Sync already in progress'
-        }, status=400)
-    
     location_id = request.data.get('location_id')
     if not location_id:
         return JsonResponse({
@@ -739,54 +326,58 @@ def sync_gohighlevel_data(request):
             'message': 'Location ID is required'
         }, status=400)
     
-    # Reset sync status
-    ghl_sync_status = {
-        'running': True,
-        'progress': 0,
-        'total': 0,
-        'completed': 0,
-        'errors': 0,
-        'message': 'Starting GoHighLevel sync'
-    }
-    stop_sync_flag = False
+    if find_active_job('ghl_sync', location_id=location_id) or find_active_job('ghl_sync_all'):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Sync already in progress'
+        }, status=400)
     
-    # Start sync in a background thread
-    thread = threading.Thread(target=run_ghl_sync, args=(location_id,))
-    thread.daemon = True
-    thread.start()
+    # Replace the previous run's final status so a stop requested before the job starts is kept
+    reset_progress(ghl_sync_key(location_id), 'queued', 'Sync queued, waiting for a worker')
+    job = enqueue('ghl_sync', {'location_id': location_id}, max_attempts=1)
     
     return JsonResponse({
         'status': 'success',
-        'message': 'GoHighLevel sync started'
-    })
+        'message': 'GoHighLevel sync queued',
+        'job_id': str(job.id),
+        'status_url': reverse('get_job_status', args=[job.id])
+    }, status=202)
 
-def run_ghl_sync(location_id):
+@api_view(['POST'])
+def sync_all_gohighlevel_locations(request):
     """
-    Run the GoHighLevel sync process in a background thread
+    Sync every connected GoHighLevel location concurrently
     """
-    global ghl_sync_status, stop_sync_flag
+    job = find_active_job('ghl_sync_all')
+    if job is None:
+        payload = {}
+        if request.data.get('location_ids'):
+            payload['location_ids'] = request.data['location_ids']
+        if request.data.get('max_workers'):
+            payload['max_workers'] = int(request.data['max_workers'])
+        job = enqueue('ghl_sync_all', payload, max_attempts=2)
     
-    try:
-        ghl_sync_status['message'] = 'Syncing GoHighLevel contacts'
-        success_count, error_count = sync_all_ghl_contacts(location_id)
-        
-        ghl_sync_status['completed'] = success_count
-        ghl_sync_status['errors'] = error_count
-        ghl_sync_status['message'] = f'Completed GoHighLevel sync: {success_count} contacts synced, {error_count} errors'
-        ghl_sync_status['progress'] = 100
-    except Exception as e:
-        logger.exception("Error during GoHighLevel sync")
-        ghl_sync_status['message'] = f'Error during GoHighLevel sync: {str(e)}'
-        ghl_sync_status['errors'] += 1
-    finally:
-        ghl_sync_status['running'] = False
+    return JsonResponse({
+        'status': 'success',
+        'message': 'GoHighLevel sync queued for all locations',
+        'job_id': str(job.id),
+        'status_url': reverse('get_job_status', args=[job.id])
+    }, status=202)
+
+@api_view(['GET'])
+def get_job_status(request, job_id):
+    """Get the status and result of a queued background job."""
+    job = SyncJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    return JsonResponse(job_to_dict(job))
 
 @staff_member_required
 def ghl_dashboard_view(request):
     """
     Standalone dashboard view for GoHighLevel integration
     """
-    tokens = OAuth2Token.objects.all().order_by('-updated_at')
+    tokens = token_status_summaries()
     logs = TokenRequestLog.objects.all().order_by('-created_at')[:10]
     
     context = {
@@ -806,35 +397,12 @@ def sync_dashboard(request):
     Dashboard for monitoring and managing sync operations
     """
     sync_states = SyncState.objects.all().order_by('-last_sync_time')
-    tokens = OAuth2Token.objects.all()
     
     # Get recent sync logs
     sync_logs = SystemLog.objects.filter(type='sync').order_by('-timestamp')[:50]
     
     # Get token information
-    token_info = []
-    for token in tokens:
-        expires_at = token.expires_at
-        is_expired = False
-        status = "Valid"
-        
-        if expires_at:
-            now = timezone.now()
-            if expires_at < now:
-                is_expired = True
-                status = "Expired"
-            elif (expires_at - now).total_seconds() < 3600:  # Less than 1 hour
-                status = "Expiring Soon"
-        
-        token_data = {
-            'id': token.id,
-            'location_id': token.location_id,
-            'location_name': token.location_name or f"Location {token.location_id}",
-            'expires_at': expires_at,
-            'is_expired': is_expired,
-            'status': status
-        }
-        token_info.append(token_data)
+    token_info = token_status_summaries()
     
     return render(request, 'admin/sync_dashboard.html', {
         'sync_states': sync_states,
@@ -1063,31 +631,7 @@ def system_status(request):
     View for system status dashboard
     """
     # Get OAuth tokens
-    tokens = OAuth2Token.objects.all()
-    token_info = []
-    
-    for token in tokens:
-        expires_at = token.expires_at
-        is_expired = False
-        status = "Valid"
-        
-        if expires_at:
-            now = timezone.now()
-            if expires_at < now:
-                is_expired = True
-                status = "Expired"
-            elif (expires_at - now).total_seconds() < 3600:  # Less than 1 hour
-                status = "Expiring Soon"
-        
-        token_data = {
-            'id': token.id,
-            'location_id': token.location_id,
-            'location_name': token.location_name or f"Location {token.location_id}",
-            'expires_at': expires_at,
-            'is_expired': is_expired,
-            'status': status
-        }
-        token_info.append(token_data)
+    token_info = token_status_summaries()
     
     # Get sync states
     sync_states = SyncState.objects.all().order_by('-last_sync_time')[:5]
@@ -1147,9 +691,11 @@ def system_status(request):
 def appointment_webhook(request):
     """
     Endpoint to receive appointment data from external webhooks.
+    
+    The payload is stored as a pending AppointmentWebhookLog and
+    acknowledged with 202; `manage.py process_webhooks` processes it.
     """
     try:
-        # Log the incoming webhook
         webhook_log = AppointmentWebhookLog.objects.create(
             source=request.GET.get('source', 'unknown'),
             headers=dict(request.headers),
@@ -1157,27 +703,16 @@ def appointment_webhook(request):
             status='pending'
         )
         
-        logger.info(f"Received appointment webhook: {webhook_log.id}")
-        
-        # Process the webhook based on the source
-        source = webhook_log.source.lower()
-        
-        if source == 'gohighlevel' or source == 'ghl':
-            # Use the specialized GoHighLevel processor
-            from .ghl_processor import process_ghl_appointment_webhook
-            appointment = process_ghl_appointment_webhook(webhook_log)
-        else:
-            # Use the generic processor for other sources
-            appointment = process_appointment_webhook(webhook_log)
+        logger.info(f"Queued appointment webhook: {webhook_log.id}")
         
         return Response({
-            "status": "success",
-            "message": "Webhook received successfully",
+            "status": "accepted",
+            "message": "Webhook queued for processing",
             "webhook_id": str(webhook_log.id)
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
-        logger.error(f"Error processing appointment webhook: {str(e)}")
+        logger.error(f"Error storing appointment webhook: {str(e)}")
         return Response({
             "status": "error",
             "message": f"Error processing webhook: {str(e)}"
@@ -1206,16 +741,12 @@ def process_appointment_webhook(webhook_log):
             'raw_data': payload
         }
         
-        # Try to find an existing contact
-        contact = None
-        contact_email = payload.get('email')
-        contact_phone = payload.get('phone')
-        
-        if contact_email:
-            contact = Contact.objects.filter(email=contact_email).first()
-        
-        if not contact and contact_phone:
-            contact = Contact.objects.filter(phone=contact_phone).first()
+        # Try to find an existing contact by email, then phone
+        contact = get_identity_index().find(
+            order=('email', 'phone'),
+            email=payload.get('email'),
+            phone=payload.get('phone'),
+        )
         
         if contact:
             appointment_data['contact'] = contact
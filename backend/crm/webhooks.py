@@ -0,0 +1,130 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import AppointmentWebhookLog
+from .utils import sqlite_write_lock
+
+logger = logging.getLogger(__name__)
+
+def claim_webhook_batch(batch_size):
+    """
+    Claim the oldest pending webhook logs for processing.
+
+    Candidate rows are locked with SELECT ... FOR UPDATE SKIP LOCKED and
+    claimed with a conditional UPDATE, like crm.jobs.claim_job, so several
+    drainers can run against the same table.
+
+    Args:
+        batch_size (int): Most logs to claim
+
+    Returns:
+        list: The claimed AppointmentWebhookLog instances, oldest first
+    """
+    now = timezone.now()
+    with sqlite_write_lock(), transaction.atomic():
+        ids = list(
+            AppointmentWebhookLog.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('created_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        AppointmentWebhookLog.objects.filter(id__in=ids, status='pending').update(
+            status='processing', locked_at=now
+        )
+    return list(
+        AppointmentWebhookLog.objects.filter(id__in=ids, status='processing', locked_at=now).order_by('created_at')
+    )
+
+def process_webhook_log(webhook_log):
+    """
+    Run the processor for a webhook log's source.
+
+    The processors record success or error on the log themselves; a log
+    they leave in 'processing' is marked as an error.
+
+    Returns:
+        Appointment: The created or updated appointment, or None
+    """
+    source = webhook_log.source.lower()
+    try:
+        if source == 'gohighlevel' or source == 'ghl':
+            # Use the specialized GoHighLevel processor
+            from .ghl_processor import process_ghl_appointment_webhook
+            processor = process_ghl_appointment_webhook
+        else:
+            # Use the generic processor for other sources
+            from .views import process_appointment_webhook
+            processor = process_appointment_webhook
+        # SQLite takes one writer at a time; elsewhere logs are processed concurrently
+        with sqlite_write_lock():
+            appointment = processor(webhook_log)
+    except Exception as e:
+        logger.exception(f"Error processing webhook {webhook_log.id}: {str(e)}")
+        webhook_log.status = 'error'
+        webhook_log.error_message = str(e)
+        webhook_log.save(update_fields=['status', 'error_message'])
+        return None
+    if webhook_log.status == 'processing':
+        webhook_log.status = 'error'
+        webhook_log.error_message = webhook_log.error_message or 'Processor did not record a result'
+        webhook_log.save(update_fields=['status', 'error_message'])
+    return appointment
+
+def drain_webhooks(batch_size=None, max_workers=None, stopping=None):
+    """
+    Process pending webhook logs in batches until none are left.
+
+    Each batch is claimed at once and processed by a pool of at most
+    max_workers threads.
+
+    Args:
+        batch_size (int): Logs claimed per batch (defaults to WEBHOOK_QUEUE['BATCH_SIZE'])
+        max_workers (int): Logs processed at once (defaults to WEBHOOK_QUEUE['WORKERS'])
+        stopping (threading.Event): Stop after the current batch once set
+
+    Returns:
+        dict: Counts of processed, success and error logs
+    """
+    config = settings.WEBHOOK_QUEUE
+    batch_size = batch_size or config['BATCH_SIZE']
+    max_workers = max(1, max_workers or config['WORKERS'])
+    counts = {'processed': 0, 'success': 0, 'error': 0}
+
+    def process(webhook_log):
+        try:
+            process_webhook_log(webhook_log)
+            return webhook_log.status
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='webhook') as executor:
+        while stopping is None or not stopping.is_set():
+            batch = claim_webhook_batch(batch_size)
+            if not batch:
+                break
+            for result in executor.map(process, batch):
+                counts['processed'] += 1
+                counts['success' if result == 'success' else 'error'] += 1
+            logger.info(f"Processed {len(batch)} appointment webhooks")
+    return counts
+
+def requeue_stale_webhooks(stale_after=None):
+    """
+    Put logs left in 'processing' by a stopped worker back to 'pending'.
+
+    Returns:
+        int: Number of logs requeued
+    """
+    stale_after = stale_after or settings.WEBHOOK_QUEUE['STALE_AFTER']
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    count = AppointmentWebhookLog.objects.filter(status='processing', locked_at__lt=cutoff).update(
+        status='pending', locked_at=None
+    )
+    if count:
+        logger.warning(f"Requeued {count} stale appointment webhooks")
+    return count
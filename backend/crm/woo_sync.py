@@ -1,281 +1,810 @@
 import logging
+import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
 from django.utils import timezone
-from .models import Contact, Order, Product
-from .woocommerce import WooCommerceAPI
+from django.utils.dateparse import parse_datetime
+from .models import Contact, Order, Product, SyncState, SystemLog
+from .identity import WOO_MATCH_ORDER, get_identity_index, normalize_email, normalize_phone
+from .progress import ProgressTracker, WOO_SYNC_KEY
+from .utils import log_system_event, payload_fingerprint
+from .woocommerce import get_woocommerce_api
 
 logger = logging.getLogger(__name__)
 
-def sync_woocommerce_contacts(api=None):
+PRODUCT_FIELDS = [
+    'name', 'description', 'price', 'regular_price', 'sale_price', 'status',
+    'stock_status', 'stock_quantity', 'categories', 'images',
+]
+
+def parse_woo_amount(value):
+    """Parse a WooCommerce money string ('' for unset) into a 2dp Decimal."""
+    try:
+        return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return Decimal('0.00')
+
+def build_product_data(product):
+    """Map a WooCommerce product onto Product field values."""
+    return {
+        'name': product['name'],
+        'description': product['description'],
+        'price': parse_woo_amount(product['price']),
+        'regular_price': parse_woo_amount(product.get('regular_price')),
+        'sale_price': parse_woo_amount(product.get('sale_price')),
+        'status': product['status'],
+        'stock_status': product.get('stock_status', 'instock'),
+        'stock_quantity': product.get('stock_quantity', 0),
+        'categories': [cat['name'] for cat in product.get('categories', [])],
+        'images': [img['src'] for img in product.get('images', [])],
+    }
+
+def process_product(product):
+    Product.objects.update_or_create(
+        woo_product_id=product['id'],
+        defaults=build_product_data(product)
+    )
+
+def process_product_batch(products):
+    """
+    Create or update products for a page of WooCommerce products.
+    
+    Existing rows are loaded with one query and products whose stored
+    values already match are skipped; the rest are written with a single
+    bulk upsert keyed on woo_product_id. If the batch write fails, the page
+    is retried one product at a time.
+    
+    Args:
+        products (list): Product dicts from the WooCommerce API
+        
+    Returns:
+        tuple: (written, failures) where written is the number of rows
+        inserted or updated and failures is a list of (product, exception)
+    """
+    failures = []
+    rows = {}
+    for product in products:
+        try:
+            rows[int(product['id'])] = (product, build_product_data(product))
+        except Exception as e:
+            failures.append((product, e))
+    if not rows:
+        return 0, failures
+    
+    stored = {
+        values['woo_product_id']: values
+        for values in Product.objects.filter(woo_product_id__in=list(rows)).values('woo_product_id', *PRODUCT_FIELDS)
+    }
+    changed = [
+        (product, Product(woo_product_id=woo_id, **data))
+        for woo_id, (product, data) in rows.items()
+        if woo_id not in stored or any(stored[woo_id][field] != data[field] for field in PRODUCT_FIELDS)
+    ]
+    if not changed:
+        return 0, failures
+    
+    try:
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                [instance for _, instance in changed],
+                update_conflicts=True,
+                unique_fields=['woo_product_id'],
+                update_fields=PRODUCT_FIELDS + ['updated_at'],
+            )
+        logger.info(f"Upserted {len(changed)} WooCommerce products ({len(rows) - len(changed)} unchanged)")
+    except Exception as e:
+        logger.warning(f"Batch write of {len(changed)} products failed, retrying individually: {str(e)}")
+        for product, _ in changed:
+            try:
+                process_product(product)
+            except Exception as product_error:
+                failures.append((product, product_error))
+    
+    return len(changed), failures
+
+def build_customer_contact_data(customer, synced_at):
+    """Map a WooCommerce customer onto Contact field values."""
+    return {
+        'woo_customer_id': customer['id'],
+        'first_name': customer['first_name'],
+        'last_name': customer['last_name'],
+        'email': customer['email'],
+        'email_key': normalize_email(customer['email']),
+        'phone': customer['billing'].get('phone', ''),
+        'normalized_phone': normalize_phone(customer['billing'].get('phone')),
+        'billing_address': customer['billing'].get('address_1', ''),
+        'billing_city': customer['billing'].get('city', ''),
+        'billing_state': customer['billing'].get('state', ''),
+        'billing_postcode': customer['billing'].get('postcode', ''),
+        'woo_data': customer,
+        'woo_data_hash': payload_fingerprint(customer),
+        'woo_last_sync': synced_at
+    }
+
+def is_unchanged_customer(contact, contact_data):
+    """Whether a contact already holds this exact WooCommerce payload."""
+    return (
+        contact.woo_data_hash == contact_data['woo_data_hash']
+        and contact.woo_customer_id == contact_data['woo_customer_id']
+    )
+
+def process_customer(customer):
+    """Process a customer from WooCommerce and create/update in our database."""
+    try:
+        # First, try to find an existing contact by email (case-insensitive)
+        email = customer['email'].lower()
+        index = get_identity_index()
+        contact = index.find(order=WOO_MATCH_ORDER, email=email, woo_id=customer.get('id'))
+        
+        # Prepare the data to update
+        contact_data = build_customer_contact_data(customer, timezone.now())
+        
+        # Nothing changed upstream since the last sync: skip the write entirely
+        if contact and is_unchanged_customer(contact, contact_data):
+            logger.debug(f"Customer {email} unchanged since last sync, skipping")
+            return contact
+        
+        # Get user role information for logging
+        role = "unknown"
+        if 'role' in customer:
+            role = customer['role']
+        
+        logger.info(f"Processing customer with email: {email}, role: {role}")
+        
+        # Log member processing to SystemLog for visibility
+        if role and role != 'customer':
+            log_system_event(
+                message=f"Processing non-customer user: {email} with role: {role}",
+                type='sync',
+                status='info',
+                details={
+                    'email': email,
+                    'role': role,
+                    'woo_id': customer.get('id')
+                }
+            )
+            
+        if contact:
+            logger.info(f"Found existing contact: ID={contact.id}, WooID={contact.woo_customer_id}, Source={contact.primary_source}")
+        else:
+            logger.info(f"No existing contact found for email: {email}")
+        
+        # If contact exists, update it
+        if contact:
+            # Only set primary_source to 'woo' if it's currently 'crm'
+            if contact.primary_source == 'crm':
+                contact_data['primary_source'] = 'woo'
+                logger.info("Changing primary source from 'crm' to 'woo'")
+                
+            # Update the contact with WooCommerce data
+            for key, value in contact_data.items():
+                setattr(contact, key, value)
+            
+            # Save the contact
+            try:
+                contact.save()
+                index.add(contact)
+                logger.info(f"Updated existing contact with email {email} from WooCommerce (ID: {customer['id']})")
+                return contact
+            except Exception as save_error:
+                logger.error(f"Error saving contact {contact.id}: {str(save_error)}")
+                raise
+        else:
+            # Create a new contact
+            contact_data['primary_source'] = 'woo'  # Set primary source for new contacts
+            try:
+                contact = Contact.objects.create(**contact_data)
+                index.add(contact)
+                logger.info(f"Created new contact with email {email} from WooCommerce (ID: {customer['id']})")
+                return contact
+            except Exception as create_error:
+                logger.error(f"Error creating contact with email {email}: {str(create_error)}")
+                raise
+            
+    except Exception as e:
+        logger.error(f"Error processing customer {customer.get('id', 'unknown')}: {str(e)}")
+        logger.exception("Full exception details:")
+        raise
+
+CUSTOMER_UPDATE_FIELDS = [
+    'woo_customer_id', 'first_name', 'last_name', 'email', 'email_key', 'phone', 'normalized_phone', 'billing_address',
+    'billing_city', 'billing_state', 'billing_postcode', 'woo_data', 'woo_data_hash', 'woo_last_sync',
+    'primary_source', 'updated_at',
+]
+
+def process_customer_batch(customers):
+    """
+    Create or update contacts for a page of WooCommerce customers.
+    
+    Customers are matched by email (or woo_customer_id) against the shared
+    ContactIdentityIndex and the matched contacts loaded with one query,
+    contacts whose stored payload fingerprint matches are skipped, changes
+    are applied in memory, and everything is written with
+    bulk_create/bulk_update in a single transaction. If the batch write
+    fails, the page is retried one customer at a time so a single bad
+    record doesn't fail its neighbours. A customer whose email repeats an
+    earlier one in the page is processed on its own after the batch.
+    
+    Args:
+        customers (list): Customer dicts from the WooCommerce API
+        
+    Returns:
+        list: (customer, exception) pairs for customers that failed
+    """
+    now = timezone.now()
+    failures = []
+    rows = {}
+    duplicates = []
+    for customer in customers:
+        try:
+            key = customer['email'].strip().lower()
+            if not key:
+                raise ValueError("Customer has no email")
+            if key in rows:
+                # A second customer with the same email would overwrite the first
+                # in the batch; it goes through the per-customer path afterwards
+                duplicates.append(customer)
+                continue
+            rows[key] = (customer, build_customer_contact_data(customer, now))
+        except Exception as e:
+            failures.append((customer, e))
+    if not rows:
+        return failures
+    
+    index = get_identity_index()
+    index.load_missing({'email': key, 'woo_id': data['woo_customer_id']} for key, (_, data) in rows.items())
+    matches = {
+        key: index.match(order=WOO_MATCH_ORDER, email=key, woo_id=data['woo_customer_id'])
+        for key, (_, data) in rows.items()
+    }
+    existing = index.fetch(matches.values())
+    
+    to_create = []
+    to_update = []
+    logs = []
+    skipped = 0
+    for key, (customer, contact_data) in rows.items():
+        contact = existing.get(matches[key])
+        if contact and is_unchanged_customer(contact, contact_data):
+            skipped += 1
+            continue
+        if contact:
+            if contact.primary_source == 'crm':
+                contact_data['primary_source'] = 'woo'
+            for field, value in contact_data.items():
+                setattr(contact, field, value)
+            contact.updated_at = now
+            to_update.append(contact)
+        else:
+            to_create.append(Contact(primary_source='woo', **contact_data))
+        
+        role = customer.get('role', 'unknown')
+        if role and role != 'customer':
+            logs.append(SystemLog(
+                message=f"Processing non-customer user: {key} with role: {role}",
+                type='sync',
+                status='info',
+                details={'email': key, 'role': role, 'woo_id': customer.get('id')}
+            ))
+    
+    try:
+        with transaction.atomic():
+            Contact.objects.bulk_create(to_create)
+            Contact.objects.bulk_update(to_update, CUSTOMER_UPDATE_FIELDS)
+            SystemLog.objects.bulk_create(logs)
+        for contact in to_create + to_update:
+            index.add(contact)
+        logger.info(f"Upserted {len(rows)} WooCommerce customers ({len(to_create)} created, {len(to_update)} updated, {skipped} unchanged)")
+    except Exception as e:
+        logger.warning(f"Batch write of {len(rows)} customers failed, retrying individually: {str(e)}")
+        for customer, _ in rows.values():
+            try:
+                process_customer(customer)
+            except Exception as customer_error:
+                failures.append((customer, customer_error))
+    
+    for customer in duplicates:
+        logger.warning(f"WooCommerce customer {customer.get('id')} shares email {customer['email']} with another customer in the same page")
+        try:
+            process_customer(customer)
+        except Exception as customer_error:
+            failures.append((customer, customer_error))
+    
+    return failures
+
+def parse_woo_datetime(value):
+    """Parse a WooCommerce *_gmt timestamp into an aware UTC datetime."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+class SyncWatermark:
+    """
+    Per-resource high-water mark for incremental WooCommerce syncs.
+    
+    The mark is the latest `date_modified_gmt` seen in a run and is stored in
+    SyncState. If some records failed, the mark only advances to just before
+    the earliest failure so those records are fetched again next time.
+    """
+    
+    def __init__(self, sync_type, incremental=True):
+        """
+        Args:
+            sync_type (str): One of the woo_* SyncState types
+            incremental (bool): Whether to fetch only records changed since the stored mark
+        """
+        self.state, _ = SyncState.objects.get_or_create(sync_type=sync_type, location_id='')
+        self.since = self.state.high_water_mark if incremental else None
+        self.latest = self.state.high_water_mark
+        self.earliest_failure = None
+    
+    def is_changed(self, record):
+        """
+        Whether a record was modified at or after the stored mark.
+        
+        Records from the mark's own second are kept, since dates only have
+        second precision; the processors skip the ones whose payload has not
+        changed.
+        """
+        if not self.since:
+            return True
+        modified = parse_woo_datetime(record.get('date_modified_gmt'))
+        return modified is None or modified >= self.since
+    
+    def seen(self, record, success=True):
+        """Record that a record was processed."""
+        modified = parse_woo_datetime(record.get('date_modified_gmt'))
+        if not modified:
+            return
+        if success:
+            if not self.latest or modified > self.latest:
+                self.latest = modified
+        elif not self.earliest_failure or modified < self.earliest_failure:
+            self.earliest_failure = modified
+    
+    def commit(self, success_count=0, error_count=0):
+        """Persist the mark after a run that fetched every page."""
+        mark = self.latest
+        if self.earliest_failure:
+            # Leave failed records inside the next incremental window
+            retry_from = self.earliest_failure - datetime.timedelta(seconds=1)
+            mark = min(mark, retry_from) if mark else retry_from
+        self.state.high_water_mark = mark
+        self.state.success_count = success_count
+        self.state.error_count = error_count
+        self.state.last_sync_time = timezone.now()
+        self.state.is_complete = True
+        self.state.save()
+        logger.info(f"Saved {self.state.sync_type} high-water mark: {mark}")
+
+def log_record_failure(kind, record, error, label_field):
+    """Log a record that failed to sync, including a SystemLog entry for admin visibility."""
+    error_msg = f"Error processing {kind} {record.get('id', 'unknown')}: {str(error)}"
+    logger.error(error_msg)
+    log_system_event(
+        message=error_msg,
+        type='sync',
+        status='error',
+        details={
+            f'{kind}_id': record.get('id'),
+            'error': str(error),
+            f'{kind}_{label_field}': record.get(label_field, 'unknown')
+        }
+    )
+
+def sync_woocommerce_contacts(api=None, incremental=False, should_stop=None, on_progress=None):
     """
     Sync contacts from WooCommerce
     
+    Each page is written in one transaction by process_customer_batch.
+    
+    WooCommerce cannot filter customers by modification date, so every run
+    pages through all customers. Incremental runs only process the ones
+    modified since the last sync and skip the rest client-side.
+    
     Args:
-        api (WooCommerceAPI): Optional WooCommerce API instance
+        api (WooCommerceAPI): Optional WooCommerce API instance (defaults to the shared client)
+        incremental (bool): Only process customers modified since the last sync
+        should_stop (callable): Optional callback; the sync stops when it returns True
+        on_progress (callable): Optional callback receiving (processed, total, success, errors)
         
     Returns:
         tuple: (success_count, error_count)
     """
     if api is None:
-        api = WooCommerceAPI()
+        api = get_woocommerce_api()
     
-    page = 1
-    per_page = 100
+    watermark = SyncWatermark('woo_customers', incremental=incremental)
     success_count = 0
     error_count = 0
     
-    while True:
-        try:
-            customers = api.get_customers(page=page, per_page=per_page)
-            
-            if not customers:
-                break
-            
-            for customer_data in customers:
-                try:
-                    woo_id = customer_data.get('id')
-                    if not woo_id:
-                        continue
-                    
-                    # Try to find an existing contact by WooCommerce ID
-                    contact = Contact.objects.filter(woo_id=woo_id).first()
-                    
-                    # If not found by WooCommerce ID, try by email
-                    if not contact:
-                        email = customer_data.get('email')
-                        if email:
-                            contact = Contact.objects.filter(email=email).first()
-                    
-                    # Extract contact data
-                    contact_data = {
-                        'first_name': customer_data.get('first_name', ''),
-                        'last_name': customer_data.get('last_name', ''),
-                        'email': customer_data.get('email', ''),
-                        'woo_id': woo_id,
-                        'woo_data': customer_data,
-                    }
-                    
-                    # Get phone from billing info if available
-                    billing = customer_data.get('billing', {})
-                    if billing and 'phone' in billing:
-                        contact_data['phone'] = billing.get('phone', '')
-                    
-                    # Create or update the contact
-                    if contact:
-                        # Update existing contact
-                        for key, value in contact_data.items():
-                            setattr(contact, key, value)
-                        
-                        # If this is the first time we're adding WooCommerce data to an existing contact
-                        if 'woo' not in contact.source:
-                            contact.source = list(set(contact.source + ['woo']))
-                        
-                        contact.date_updated = timezone.now()
-                        contact.save()
-                        logger.info(f"Updated contact {contact.id} with WooCommerce data")
-                    else:
-                        # Create new contact
-                        contact_data['source'] = ['woo']
-                        contact = Contact.objects.create(**contact_data)
-                        logger.info(f"Created new contact {contact.id} from WooCommerce data")
-                    
-                    success_count += 1
-                except Exception as e:
-                    logger.exception(f"Error syncing WooCommerce customer {customer_data.get('id')}: {str(e)}")
-                    error_count += 1
-            
-            # If we got fewer results than requested, we've reached the end
-            if len(customers) < per_page:
-                break
-            
-            page += 1
-        except Exception as e:
-            logger.exception(f"Error fetching WooCommerce customers page {page}: {str(e)}")
-            error_count += 1
-            break
+    try:
+        for page in api.iter_customers():
+            if should_stop and should_stop():
+                logger.info("WooCommerce customer sync stopped by user")
+                return success_count, error_count
+            changed = [customer for customer in page['data'] if watermark.is_changed(customer)]
+            failures = process_customer_batch(changed)
+            failed_ids = {id(customer) for customer, _ in failures}
+            for customer, e in failures:
+                log_record_failure('customer', customer, e, 'email')
+            for customer in changed:
+                watermark.seen(customer, success=id(customer) not in failed_ids)
+            success_count += len(changed) - len(failures)
+            error_count += len(failures)
+            if on_progress:
+                on_progress(success_count + error_count, page['total'], success_count, error_count)
+    except Exception as e:
+        logger.exception(f"Error fetching WooCommerce customers: {str(e)}")
+        log_system_event(
+            message=f"Error fetching customers: {str(e)}",
+            type='sync',
+            status='error',
+            details={'error': str(e)}
+        )
+        error_count += 1
+        return success_count, error_count
     
+    watermark.commit(success_count, error_count)
     return success_count, error_count
 
-def sync_woocommerce_orders(api=None):
+def resolve_order_contact(order_data, index):
+    """
+    Find the contact id for an order, creating a contact from the billing
+    details when no existing contact matches.
+    
+    Args:
+        order_data (dict): Order from the WooCommerce API
+        index (ContactIdentityIndex): Index to match the customer id, then billing email, against
+    
+    Returns:
+        UUID: The contact id, or None if the order cannot be attached to anyone
+    """
+    billing = order_data.get('billing') or {}
+    email = (billing.get('email') or '').strip()
+    contact_id = index.match(order=('woo_id', 'email'), woo_id=order_data.get('customer_id'), email=email)
+    if contact_id:
+        return contact_id
+    if not email:
+        return None
+    
+    contact = Contact.objects.create(
+        first_name=billing.get('first_name', ''),
+        last_name=billing.get('last_name', ''),
+        email=email,
+        phone=billing.get('phone', ''),
+        primary_source='woo',
+        woo_data={'billing': billing}
+    )
+    logger.info(f"Created new contact {contact.id} from WooCommerce order data")
+    index.add(contact)
+    return contact.id
+
+def build_order(order_data, contact_id):
+    """Build an unsaved Order from WooCommerce order data."""
+    return Order(
+        contact_id=contact_id,
+        woo_order_id=str(order_data['id']),
+        order_date=parse_woo_datetime(order_data.get('date_created_gmt')) or timezone.now(),
+        total_amount=parse_woo_amount(order_data.get('total')),
+        status=order_data.get('status', ''),
+    )
+
+def upsert_orders(orders):
+    """
+    Insert or update a batch of orders in one statement keyed on woo_order_id.
+    
+    Args:
+        orders (list): Unsaved Order instances with distinct woo_order_ids
+    """
+    with transaction.atomic():
+        Order.objects.bulk_create(
+            orders,
+            update_conflicts=True,
+            unique_fields=['woo_order_id'],
+            update_fields=['contact', 'order_date', 'total_amount', 'status', 'updated_at'],
+        )
+
+def sync_woocommerce_orders(api=None, incremental=False, batch_size=500, should_stop=None, on_progress=None):
     """
     Sync orders from WooCommerce
     
+    Pages are streamed (several at once, per the client's concurrency),
+    contacts are resolved from the contact identity index and orders are written in
+    batches with a bulk upsert keyed on woo_order_id.
+    
     Args:
-        api (WooCommerceAPI): Optional WooCommerce API instance
+        api (WooCommerceAPI): Optional WooCommerce API instance (defaults to the shared client)
+        incremental (bool): Only fetch orders modified since the last sync
+        batch_size (int): Orders per bulk upsert
+        should_stop (callable): Optional callback; the sync stops when it returns True
+        on_progress (callable): Optional callback receiving (processed, total, success, errors)
         
     Returns:
         tuple: (success_count, error_count)
     """
     if api is None:
-        api = WooCommerceAPI()
+        api = get_woocommerce_api()
     
-    page = 1
-    per_page = 100
+    watermark = SyncWatermark('woo_orders', incremental=incremental)
+    # Full reload: order rows reference contact ids directly, so none may be stale
+    index = get_identity_index(full=True)
     success_count = 0
     error_count = 0
+    total = 0
+    batch = {}
+    batch_records = []
     
-    while True:
+    def flush():
+        nonlocal success_count, error_count
+        if not batch:
+            return
         try:
-            orders = api.get_orders(page=page, per_page=per_page)
-            
-            if not orders:
-                break
-            
-            for order_data in orders:
+            upsert_orders(list(batch.values()))
+            success_count += len(batch_records)
+            for record in batch_records:
+                watermark.seen(record)
+        except Exception as e:
+            logger.exception(f"Error writing batch of {len(batch)} WooCommerce orders: {str(e)}")
+            error_count += len(batch_records)
+            for record in batch_records:
+                watermark.seen(record, success=False)
+        batch.clear()
+        batch_records.clear()
+        if on_progress:
+            on_progress(success_count + error_count, total, success_count, error_count)
+    
+    try:
+        for page in api.iter_orders(modified_after=watermark.since):
+            total = page['total']
+            index.load_missing(
+                {'woo_id': order_data.get('customer_id'), 'email': (order_data.get('billing') or {}).get('email')}
+                for order_data in page['data']
+            )
+            for order_data in page['data']:
+                if not watermark.is_changed(order_data):
+                    continue
                 try:
-                    woo_id = order_data.get('id')
-                    if not woo_id:
-                        continue
-                    
-                    # Try to find an existing order by WooCommerce ID
-                    order = Order.objects.filter(woo_id=woo_id).first()
-                    
-                    # Find the contact for this order
-                    customer_id = order_data.get('customer_id')
-                    contact = None
-                    
-                    if customer_id:
-                        contact = Contact.objects.filter(woo_id=customer_id).first()
-                    
-                    if not contact and 'billing' in order_data:
-                        billing = order_data.get('billing', {})
-                        email = billing.get('email')
-                        
-                        if email:
-                            contact = Contact.objects.filter(email=email).first()
-                    
-                    # If we still don't have a contact, create one from the order data
-                    if not contact and 'billing' in order_data:
-                        billing = order_data.get('billing', {})
-                        
-                        contact_data = {
-                            'first_name': billing.get('first_name', ''),
-                            'last_name': billing.get('last_name', ''),
-                            'email': billing.get('email', ''),
-                            'phone': billing.get('phone', ''),
-                            'source': ['woo'],
-                            'woo_data': {
-                                'billing': billing
-                            }
-                        }
-                        
-                        contact = Contact.objects.create(**contact_data)
-                        logger.info(f"Created new contact {contact.id} from WooCommerce order data")
-                    
-                    if not contact:
-                        logger.warning(f"Could not find or create contact for order {woo_id}")
+                    contact_id = resolve_order_contact(order_data, index)
+                    if not contact_id:
+                        logger.warning(f"Could not find or create contact for order {order_data.get('id')}")
+                        watermark.seen(order_data)
                         continue
-                    
-                    # Extract order data
-                    order_data_dict = {
-                        'contact': contact,
-                        'woo_id': woo_id,
-                        'order_number': order_data.get('number', ''),
-                        'status': order_data.get('status', ''),
-                        'total': float(order_data.get('total', 0)),
-                        'woo_data': order_data,
-                    }
-                    
-                    # Create or update the order
-                    if order:
-                        # Update existing order
-                        for key, value in order_data_dict.items():
-                            setattr(order, key, value)
-                        
-                        order.date_updated = timezone.now()
-                        order.save()
-                        logger.info(f"Updated order {order.id} with WooCommerce data")
-                    else:
-                        # Create new order
-                        order = Order.objects.create(**order_data_dict)
-                        logger.info(f"Created new order {order.id} from WooCommerce data")
-                    
-                    success_count += 1
+                    # Keyed by order id so an order seen twice in one batch is written once
+                    batch[str(order_data['id'])] = build_order(order_data, contact_id)
+                    batch_records.append(order_data)
                 except Exception as e:
                     logger.exception(f"Error syncing WooCommerce order {order_data.get('id')}: {str(e)}")
+                    watermark.seen(order_data, success=False)
                     error_count += 1
             
-            # If we got fewer results than requested, we've reached the end
-            if len(orders) < per_page:
-                break
-            
-            page += 1
-        except Exception as e:
-            logger.exception(f"Error fetching WooCommerce orders page {page}: {str(e)}")
-            error_count += 1
-            break
+            if len(batch) >= batch_size:
+                flush()
+            if should_stop and should_stop():
+                flush()
+                logger.info("WooCommerce order sync stopped by user")
+                return success_count, error_count
+    except Exception as e:
+        flush()
+        logger.exception(f"Error fetching WooCommerce orders: {str(e)}")
+        error_count += 1
+        return success_count, error_count
     
+    flush()
+    watermark.commit(success_count, error_count)
     return success_count, error_count
 
-def sync_woocommerce_products(api=None):
+def sync_woocommerce_products(api=None, incremental=False, should_stop=None, on_progress=None):
     """
     Sync products from WooCommerce
     
+    Each page is upserted in one statement by process_product_batch.
+    
     Args:
-        api (WooCommerceAPI): Optional WooCommerce API instance
+        api (WooCommerceAPI): Optional WooCommerce API instance (defaults to the shared client)
+        incremental (bool): Only fetch products modified since the last sync
+        should_stop (callable): Optional callback; the sync stops when it returns True
+        on_progress (callable): Optional callback receiving (processed, total, success, errors)
         
     Returns:
         tuple: (success_count, error_count)
     """
     if api is None:
-        api = WooCommerceAPI()
+        api = get_woocommerce_api()
     
-    page = 1
-    per_page = 100
+    watermark = SyncWatermark('woo_products', incremental=incremental)
     success_count = 0
     error_count = 0
     
-    while True:
-        try:
-            products = api.get_products(page=page, per_page=per_page)
+    try:
+        for page in api.iter_products(modified_after=watermark.since):
+            if should_stop and should_stop():
+                logger.info("WooCommerce product sync stopped by user")
+                return success_count, error_count
+            changed = [product for product in page['data'] if watermark.is_changed(product)]
+            _, failures = process_product_batch(changed)
+            failed_ids = {id(product) for product, _ in failures}
+            for product, e in failures:
+                log_record_failure('product', product, e, 'name')
+            for product in changed:
+                watermark.seen(product, success=id(product) not in failed_ids)
+            success_count += len(changed) - len(failures)
+            error_count += len(failures)
+            if on_progress:
+                on_progress(success_count + error_count, page['total'], success_count, error_count)
+    except Exception as e:
+        logger.exception(f"Error fetching WooCommerce products: {str(e)}")
+        log_system_event(
+            message=f"Error fetching products: {str(e)}",
+            type='sync',
+            status='error',
+            details={'error': str(e)}
+        )
+        error_count += 1
+        return success_count, error_count
+    
+    watermark.commit(success_count, error_count)
+    return success_count, error_count
+
+WOO_SYNC_TYPES = ['customers', 'products', 'orders']
+
+WOO_SYNC_FUNCTIONS = {
+    'customers': sync_woocommerce_contacts,
+    'products': sync_woocommerce_products,
+    'orders': sync_woocommerce_orders,
+}
+
+def run_woocommerce_sync(sync_types=None, incremental=False, progress=None, api=None):
+    """
+    Sync customers, products and/or orders from WooCommerce.
+    
+    This is the body of the woo_sync job. Progress goes to the shared
+    SyncProgress row, where the status endpoint reads it and the stop
+    endpoint sets the flag checked between pages.
+    
+    Args:
+        sync_types (list): Any of WOO_SYNC_TYPES (defaults to all of them)
+        incremental (bool): Only fetch records modified since the last sync
+        progress (ProgressTracker): Optional tracker (defaults to the shared WooCommerce sync key)
+        api (WooCommerceAPI): Optional WooCommerce API instance (defaults to the shared client)
+        
+    Returns:
+        dict: Final message, status ('done' or 'stopped') and per-type counts
+    """
+    if progress is None:
+        progress = ProgressTracker(WOO_SYNC_KEY)
+        progress.start('Starting sync...')
+    if api is None:
+        api = get_woocommerce_api()
+    sync_types = sync_types or WOO_SYNC_TYPES
+    logger.info(f"Will sync the following types: {sync_types}")
+    details = {}
+    
+    try:
+        for current_type in sync_types:
+            if progress.should_stop():
+                progress.finish('stopped', 'Sync process stopped by user')
+                return {'message': 'Sync process stopped', 'status': 'stopped', 'details': details}
             
-            if not products:
-                break
+            label = current_type[:-1]
+            logger.info(f"Starting WooCommerce {label} sync")
+            progress.update(
+                message=f'Starting {label} sync...', force=True, reset=True,
+                type=current_type, current=0, total=0, success=0, errors=0
+            )
             
-            for product_data in products:
-                try:
-                    woo_id = product_data.get('id')
-                    if not woo_id:
-                        continue
-                    
-                    # Try to find an existing product by WooCommerce ID
-                    product = Product.objects.filter(woo_id=woo_id).first()
-                    
-                    # Extract product data
-                    product_data_dict = {
-                        'name': product_data.get('name', ''),
-                        'sku': product_data.get('sku', ''),
-                        'price': float(product_data.get('price', 0)),
-                        'woo_id': woo_id,
-                        'woo_data': product_data,
-                    }
-                    
-                    # Create or update the product
-                    if product:
-                        # Update existing product
-                        for key, value in product_data_dict.items():
-                            setattr(product, key, value)
-                        
-                        product.date_updated = timezone.now()
-                        product.save()
-                        logger.info(f"Updated product {product.id} with WooCommerce data")
-                    else:
-                        # Create new product
-                        product = Product.objects.create(**product_data_dict)
-                        logger.info(f"Created new product {product.id} from WooCommerce data")
-                    
-                    success_count += 1
-                except Exception as e:
-                    logger.exception(f"Error syncing WooCommerce product {product_data.get('id')}: {str(e)}")
-                    error_count += 1
+            def report(processed, total, success, errors):
+                progress.update(
+                    message=f'Processing {label} {processed}/{total}. Success: {success}, Errors: {errors}',
+                    current=processed, total=total, success=success, errors=errors
+                )
+            
+            success_count, error_count = WOO_SYNC_FUNCTIONS[current_type](
+                api,
+                incremental=incremental,
+                should_stop=progress.should_stop,
+                on_progress=report
+            )
+            details[current_type] = {'success': success_count, 'errors': error_count}
             
-            # If we got fewer results than requested, we've reached the end
-            if len(products) < per_page:
-                break
+            if progress.should_stop():
+                progress.finish('stopped', f'Sync process stopped by user. {label.title()}s success: {success_count}, Errors: {error_count}')
+                return {'message': 'Sync process stopped', 'status': 'stopped', 'details': details}
             
-            page += 1
+            logger.info(f"Finished {label} sync. Success: {success_count}, Errors: {error_count}")
+            progress.update(message=f'Completed {label} sync. Success: {success_count}, Errors: {error_count}', force=True)
+        
+        progress.finish('done', 'Sync complete!')
+        return {'message': 'Sync complete!', 'status': 'done', 'details': details}
+    except Exception as e:
+        progress.finish('error', f'Error: {str(e)}')
+        raise
+
+def get_woo_customer_index(emails):
+    """
+    Build a lowercased email -> woo_customer_id index from contacts
+    written by previous WooCommerce syncs.
+    """
+    keys = {normalize_email(email) for email in emails if email}
+    return dict(
+        Contact.objects.filter(email_key__in=keys, woo_customer_id__isnull=False)
+        .values_list('email_key', 'woo_customer_id')
+    )
+
+def update_contacts_from_woocommerce(emails, api=None):
+    """
+    Re-import specific contacts (e.g. 'member' role users) from WooCommerce.
+    
+    Args:
+        emails (list): Email addresses to look up
+        api (WooCommerceAPI): Optional WooCommerce API instance (defaults to the shared client)
+        
+    Returns:
+        list: One result dict per email with its status and message
+    """
+    if api is None:
+        api = get_woocommerce_api()
+    
+    log_system_event(
+        message=f"Processing {len(emails)} contacts in update_member_contacts",
+        type='sync',
+        status='info',
+        details={'emails': emails}
+    )
+    
+    # Look up only the requested emails instead of exporting every customer
+    logger.info(f"Looking up {len(emails)} customers in WooCommerce")
+    customers_by_email = api.find_customers_by_email(emails, known_ids=get_woo_customer_index(emails))
+    logger.info(f"Matched {len(customers_by_email)} of {len(emails)} emails in WooCommerce")
+    
+    results = []
+    for email in emails:
+        # Find matching WooCommerce user
+        logger.info(f"Looking for customer with email: {email}")
+        customer = customers_by_email.get(email.strip().lower())
+        
+        if not customer:
+            logger.warning(f"No WooCommerce user found with email: {email}")
+            results.append({
+                'email': email,
+                'status': 'error',
+                'message': 'No WooCommerce user found with this email'
+            })
+            continue
+        
+        # Process the customer
+        role = customer.get('role', 'unknown')
+        logger.info(f"Found customer with email {email}, role: {role}")
+        
+        try:
+            updated_contact = process_customer(customer)
+            results.append({
+                'email': email,
+                'status': 'success',
+                'message': 'Contact updated successfully',
+                'role': role,
+                'contact_id': str(updated_contact.id),
+                'woo_customer_id': updated_contact.woo_customer_id,
+                'primary_source': updated_contact.primary_source
+            })
+            logger.info(f"Successfully updated contact with email: {email}")
         except Exception as e:
-            logger.exception(f"Error fetching WooCommerce products page {page}: {str(e)}")
-            error_count += 1
-            break
+            logger.error(f"Error updating contact with email {email}: {str(e)}")
+            results.append({
+                'email': email,
+                'status': 'error',
+                'message': f'Error updating contact: {str(e)}',
+                'role': role
+            })
     
-    return success_count, error_count
+    # Log completion
+    log_system_event(
+        message=f"Completed processing {len(emails)} contacts in update_member_contacts",
+        type='sync',
+        status='success',
+        details={'results': results}
+    )
+    return results
@@ -2,11 +2,21 @@ from woocommerce import API
 import logging
 import json
 import requests
-from requests.exceptions import RequestException, Timeout
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from requests.exceptions import RequestException
+import datetime
+import threading
 import time
-from functools import wraps
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from functools import partial, wraps
 from django.conf import settings
 import os
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from urllib.parse import urlparse
 
 # Set up logging to file
 log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
@@ -25,72 +35,270 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def retry_on_error(max_retries=3, delay=1):
+    """
+    Decorator that retries a function on network errors using a RetryPolicy.
+    
+    max_retries is the total number of attempts, as before.
+    """
+    policy = RetryPolicy(max_retries=max_retries - 1, base_delay=delay)
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            retries = 0
-            while retries < max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except (RequestException, Timeout) as e:
-                    retries += 1
-                    if retries == max_retries:
-                        raise
-                    logger.warning(f"Request failed, retrying ({retries}/{max_retries}): {str(e)}")
-                    time.sleep(delay * retries)  # Exponential backoff
-            return func(*args, **kwargs)
+            return policy.call(func, *args, **kwargs)
         return wrapper
     return decorator
 
+# Attributes the sync processors actually read, requested via `_fields`
+DEFAULT_FIELDS = {
+    'customers': [
+        'id', 'email', 'first_name', 'last_name', 'role', 'billing', 'date_modified_gmt',
+    ],
+    'products': [
+        'id', 'name', 'description', 'price', 'regular_price', 'sale_price', 'status',
+        'stock_status', 'stock_quantity', 'categories', 'images', 'date_modified_gmt',
+    ],
+    'orders': [
+        'id', 'number', 'status', 'total', 'customer_id', 'billing',
+        'date_created_gmt', 'date_modified_gmt',
+    ],
+}
+
+def modified_after_params(modified_after):
+    """
+    Build the query params that limit a list call to records changed since a datetime.
+    
+    WooCommerce compares 'modified_after' strictly and to the second, so the
+    window starts one second early; records modified in the same second as
+    the mark are fetched again and skipped by the caller if unchanged.
+    """
+    if not modified_after:
+        return {}
+    if hasattr(modified_after, 'astimezone'):
+        modified_after = (modified_after - datetime.timedelta(seconds=1)).astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    return {'modified_after': modified_after, 'dates_are_gmt': 'true'}
+
+def get_woocommerce_settings():
+    """Return the WOOCOMMERCE settings dict, falling back to defaults."""
+    return getattr(settings, 'WOOCOMMERCE', {})
+
+class PooledAPI(API):
+    """
+    WooCommerce API client that sends every request through one keep-alive
+    requests.Session instead of opening a new connection per call.
+    """
+
+    def __init__(self, url, consumer_key, consumer_secret, pool_size=10, rate_limiter=None,
+                 retry_policy=None, **kwargs):
+        super().__init__(url, consumer_key, consumer_secret, **kwargs)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.host = urlparse(url).netloc
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.auth = HTTPBasicAuth(consumer_key, consumer_secret)
+        self.session.verify = self.verify_ssl
+        self.session.headers.update({
+            'user-agent': self.user_agent,
+            'accept': 'application/json'
+        })
+
+    def _request(self, method, endpoint, data=None, params=None):
+        url = f"{self.url.rstrip('/')}/wp-json/{self.version}/{endpoint}"
+        
+        def send():
+            if self.rate_limiter:
+                self.rate_limiter.wait()
+            return self.session.request(
+                method=method,
+                url=url,
+                params=params or {},
+                json=data,
+                timeout=self.timeout
+            )
+        
+        return self.retry_policy.request(self.host, send)
+
+    def get(self, endpoint, **kwargs):
+        return self._request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint, data, **kwargs):
+        return self._request("POST", endpoint, data, **kwargs)
+
+    def put(self, endpoint, data, **kwargs):
+        return self._request("PUT", endpoint, data, **kwargs)
+
+    def delete(self, endpoint, **kwargs):
+        return self._request("DELETE", endpoint, **kwargs)
+
 class WooCommerceAPI:
     """Class to interact with the WooCommerce API."""
     
-    def __init__(self, url=None, consumer_key=None, consumer_secret=None, timeout=30):
+    def __init__(self, url=None, consumer_key=None, consumer_secret=None, timeout=30,
+                 pool_size=None, health_check_interval=None, concurrency=None, rate_limit=None,
+                 full_raw=None):
+        woo_settings = get_woocommerce_settings()
         # Use the base URL without /wp-json/wc/v3 as it's added by the API class
-        base_url = "https://store.doctorsstudio.com"
+        base_url = url or "https://store.doctorsstudio.com"
         self.consumer_key = consumer_key or "ck_f2926020d6cc2df0f1186f642ba9fac9e949d4fd"
         self.consumer_secret = consumer_secret or "cs_4eb13078eb91058f4facd8870c46f3c6e7ca1745"
         self.timeout = timeout
+        self.pool_size = pool_size or woo_settings.get('POOL_SIZE', 10)
+        self.health_check_interval = (
+            health_check_interval if health_check_interval is not None
+            else woo_settings.get('HEALTH_CHECK_INTERVAL', 300)
+        )
+        # Parallel page fetching never uses more workers than pooled connections
+        self.concurrency = min(concurrency or woo_settings.get('CONCURRENCY', 4), self.pool_size)
+        self.prefetch_pages = woo_settings.get('PREFETCH_PAGES', 8)
+        self.rate_limiter = RateLimiter(
+            rate_limit if rate_limit is not None else woo_settings.get('RATE_LIMIT', 5)
+        )
+        self.retry_policy = RetryPolicy(**woo_settings.get('RETRY', {}))
+        # Full raw mode skips field projection and returns complete payloads
+        self.full_raw = full_raw if full_raw is not None else woo_settings.get('FULL_RAW', False)
+        self.fields = {**DEFAULT_FIELDS, **woo_settings.get('FIELDS', {})}
+        self._last_healthy = None
+        self._health_lock = threading.Lock()
         
-        logger.info(f"Initializing WooCommerce API with URL: {base_url}")
+        logger.info(f"Initializing WooCommerce API with URL: {base_url} (pool size {self.pool_size})")
         
         try:
-            self.wcapi = API(
+            self.wcapi = PooledAPI(
                 url=base_url,
                 consumer_key=self.consumer_key,
                 consumer_secret=self.consumer_secret,
+                pool_size=self.pool_size,
+                rate_limiter=self.rate_limiter,
+                retry_policy=self.retry_policy,
                 version="wc/v3",
                 timeout=self.timeout,
                 verify_ssl=False  # For testing only
             )
-            self._test_connection()
             logger.info("WooCommerce API initialized successfully")
         except Exception as e:
             error_msg = f"Failed to initialize WooCommerce API: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg)
 
-    @retry_on_error(max_retries=3)
+    def _mark_healthy(self):
+        self._last_healthy = time.monotonic()
+
+    def ensure_connection(self):
+        """
+        Run the connection test only if no request has succeeded within the
+        health check interval. Requests made by the sync methods count as
+        successful checks, so busy clients never pay for an extra round trip.
+        """
+        if (self._last_healthy is not None
+                and time.monotonic() - self._last_healthy < self.health_check_interval):
+            return
+        with self._health_lock:
+            if (self._last_healthy is not None
+                    and time.monotonic() - self._last_healthy < self.health_check_interval):
+                return
+            self._test_connection()
+
+    def fields_params(self, resource):
+        """Return the `_fields` projection for a resource, or nothing in full raw mode."""
+        fields = self.fields.get(resource)
+        if self.full_raw or not fields:
+            return {}
+        return {'_fields': ','.join(fields)}
+
+    def _fetch_page(self, fetch_page, page, per_page):
+        """
+        Fetch a single page, raising if it comes back empty.
+        
+        Requests are already retried by the client's RetryPolicy, so a
+        failure here is final for this run.
+        """
+        result = fetch_page(page=page, per_page=per_page)
+        if result is None:
+            raise Exception(f"No data returned for page {page}")
+        return result
+
+    def _iter_remaining_pages(self, fetch_page, total_pages, per_page, concurrency=None, prefetch=None):
+        """
+        Yield (page, result) for pages 2..total_pages in page order.
+        
+        With a concurrency above 1 the pages are fetched by a bounded thread
+        pool; requests still go through the client's shared rate limiter. At
+        most `prefetch` pages are downloaded ahead of the consumer, so memory
+        stays constant however many pages the store has.
+        """
+        concurrency = concurrency or self.concurrency
+        prefetch = max(prefetch or self.prefetch_pages, concurrency)
+        pages = range(2, total_pages + 1)
+        if concurrency <= 1 or len(pages) <= 1:
+            for page in pages:
+                yield page, self._fetch_page(fetch_page, page, per_page)
+            return
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            remaining = iter(pages)
+            pending = deque(
+                (page, executor.submit(self._fetch_page, fetch_page, page, per_page))
+                for page in islice(remaining, prefetch)
+            )
+            try:
+                while pending:
+                    page, future = pending.popleft()
+                    result = future.result()
+                    # Keep the buffer full before handing the page to the consumer
+                    next_page = next(remaining, None)
+                    if next_page is not None:
+                        pending.append((next_page, executor.submit(self._fetch_page, fetch_page, next_page, per_page)))
+                    yield page, result
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def _iter_pages(self, fetch_page, label, batch_size=100, concurrency=None, prefetch=None):
+        """
+        Stream every page of a paginated resource, starting from page 1.
+        
+        Yields each page result ('data', 'total', 'total_pages', 'current_page')
+        in page order while later pages download in the background.
+        """
+        first_page = fetch_page(page=1, per_page=batch_size)
+        if not first_page or 'total' not in first_page:
+            raise Exception(f"Failed to get initial {label} data")
+        
+        processed = len(first_page['data'])
+        logger.info(f"Processing page 1/{first_page['total_pages']} - {processed}/{first_page['total']} {label}")
+        yield first_page
+        
+        for page, result in self._iter_remaining_pages(
+                fetch_page, first_page['total_pages'], batch_size, concurrency, prefetch):
+            if result and result.get('data'):
+                processed += len(result['data'])
+                logger.info(f"Processing page {page}/{first_page['total_pages']} - {processed}/{first_page['total']} {label}")
+                yield result
+
     def _test_connection(self):
         """Test the WooCommerce API connection."""
         try:
-            response = self.wcapi.get("products", params={"per_page": 1})
+            response = self.wcapi.get("products", params={"per_page": 1, "_fields": "id"})
             if not response.ok:
                 logger.error(f"WooCommerce API connection test failed. Status code: {response.status_code}, Response: {response.text}")
                 raise Exception(f"Failed to connect to WooCommerce API. Status code: {response.status_code}")
+            self._mark_healthy()
             logger.info("WooCommerce API connection test successful")
         except Exception as e:
             logger.error(f"WooCommerce API connection error: {str(e)}")
             raise
 
-    @retry_on_error(max_retries=3)
-    def get_products(self, page=1, per_page=100):
+    def get_products(self, page=1, per_page=100, modified_after=None):
         """Get products with pagination support and better error handling."""
         try:
             response = self.wcapi.get("products", params={
                 "per_page": per_page,
                 "page": page,
-                "status": "publish"
+                "status": "publish",
+                **modified_after_params(modified_after),
+                **self.fields_params('products')
             })
             
             if not response.ok:
@@ -100,6 +308,8 @@ class WooCommerceAPI:
                 logger.error(error_msg)
                 raise Exception(error_msg)
             
+            self._mark_healthy()
+            
             # Get headers for pagination
             total_items = int(response.headers.get('X-WP-Total', 0))
             total_pages = int(response.headers.get('X-WP-TotalPages', 0))
@@ -128,65 +338,115 @@ class WooCommerceAPI:
             logger.error(f"Error getting products: {str(e)}")
             raise
 
-    @retry_on_error(max_retries=3)
-    def get_all_products(self, batch_size=100):
+    def iter_products(self, batch_size=100, concurrency=None, prefetch=None, modified_after=None):
+        """
+        Stream products page by page.
+        
+        Yields each page result from get_products as it arrives, with later
+        pages downloading in the background. Errors are raised to the caller.
+        
+        Args:
+            batch_size (int): Products per page
+            concurrency (int): Parallel page downloads (defaults to the client setting)
+            prefetch (int): Maximum pages buffered ahead of the consumer
+            modified_after (datetime): Only fetch products changed after this time
+        """
+        fetch_page = partial(self.get_products, modified_after=modified_after)
+        return self._iter_pages(fetch_page, 'products', batch_size, concurrency, prefetch)
+
+    def get_all_products(self, batch_size=100, concurrency=None, modified_after=None):
         """
         Get all products using pagination.
+        
+        Pages after the first are fetched in parallel when concurrency > 1.
         """
         try:
-            first_page = self.get_products(page=1, per_page=batch_size)
-            if not first_page or 'total' not in first_page:
-                logger.error("Failed to get initial product data")
-                return []
-                
-            processed = len(first_page['data'])
-            logger.info(f"Processing page 1/{first_page['total_pages']} - {processed}/{first_page['total']} products")
-            
-            yield first_page['data']
-            
-            # Process remaining pages
-            for page in range(2, first_page['total_pages'] + 1):
-                result = self.get_products(page=page, per_page=batch_size)
-                if result and result.get('data'):
-                    processed += len(result['data'])
-                    logger.info(f"Processing page {page}/{first_page['total_pages']} - {processed}/{first_page['total']} products")
-                    yield result['data']
+            for result in self.iter_products(batch_size=batch_size, concurrency=concurrency,
+                                             modified_after=modified_after):
+                yield result['data']
                     
         except Exception as e:
             logger.error(f"Error in get_all_products: {str(e)}")
             yield []
 
-    @retry_on_error(max_retries=3)
-    def get_orders(self):
+    def get_orders(self, page=1, per_page=100, modified_after=None):
+        """Get a page of orders, newest modifications included when modified_after is set."""
         try:
-            logger.info("Fetching orders from WooCommerce")
-            response = self.wcapi.get("orders", params={"per_page": 100})
+            logger.info(f"Fetching orders from WooCommerce (page {page}, per_page {per_page})")
+            response = self.wcapi.get("orders", params={
+                "per_page": per_page,
+                "page": page,
+                **modified_after_params(modified_after),
+                **self.fields_params('orders')
+            })
             logger.info(f"Orders response status: {response.status_code}")
             logger.debug(f"Orders response: {response.text[:500]}")  # Log first 500 chars of response
+            
             if response.status_code == 200:
-                orders = response.json()
-                logger.info(f"Retrieved {len(orders)} orders")
-                return orders
+                self._mark_healthy()
+                
+                total_items = int(response.headers.get('X-WP-Total', 0))
+                total_pages = int(response.headers.get('X-WP-TotalPages', 0))
+                
+                try:
+                    data = response.json()
+                except Exception as e:
+                    logger.error(f"Failed to parse JSON response: {str(e)}")
+                    raise Exception("Invalid JSON response from WooCommerce API")
+                
+                if not isinstance(data, list):
+                    logger.error(f"Invalid response format. Expected list but got: {type(data)}")
+                    raise Exception("Invalid response format from WooCommerce API")
+                
+                logger.info(f"Retrieved {len(data)} orders. Total pages: {total_pages}, Total items: {total_items}")
+                
+                return {
+                    'data': data,
+                    'total': total_items,
+                    'total_pages': total_pages,
+                    'current_page': page
+                }
             else:
                 logger.error(f"Failed to get orders: {response.status_code} - {response.text}")
-                return []
+                return None
         except RequestException as e:
             logger.error(f"Network error getting orders: {str(e)}")
-            return []
+            raise
         except Exception as e:
             logger.error(f"Error getting orders: {str(e)}")
-            return []
+            raise
+
+    def iter_orders(self, batch_size=100, concurrency=None, prefetch=None, modified_after=None):
+        """
+        Stream orders page by page.
+        
+        Args:
+            batch_size (int): Orders per page
+            concurrency (int): Parallel page downloads (defaults to the client setting)
+            prefetch (int): Maximum pages buffered ahead of the consumer
+            modified_after (datetime): Only fetch orders changed after this time
+        """
+        fetch_page = partial(self.get_orders, modified_after=modified_after)
+        return self._iter_pages(fetch_page, 'orders', batch_size, concurrency, prefetch)
 
-    @retry_on_error(max_retries=3)
     def get_customers(self, page=1, per_page=100):
+        # The customers endpoint has no modified_after filter, so every call
+        # lists all customers; incremental syncs skip unchanged ones locally.
         try:
             logger.info(f"Fetching customers from WooCommerce (page {page}, per_page {per_page})")
             # Add role parameter to include both customers and members
-            response = self.wcapi.get("customers", params={"per_page": per_page, "page": page, "role": "all"})
+            response = self.wcapi.get("customers", params={
+                "per_page": per_page,
+                "page": page,
+                "role": "all",
+                **self.fields_params('customers')
+            })
             logger.info(f"Customers response status: {response.status_code}")
             logger.debug(f"Customers response: {response.text[:500]}")  # Log first 500 chars of response
             
             if response.status_code == 200:
+                self._mark_healthy()
+                
                 # Get headers for pagination
                 total_items = int(response.headers.get('X-WP-Total', 0))
                 total_pages = int(response.headers.get('X-WP-TotalPages', 0))
@@ -220,31 +480,143 @@ class WooCommerceAPI:
             logger.error(f"Error getting customers: {str(e)}")
             raise
             
-    @retry_on_error(max_retries=3)
-    def get_all_customers(self, batch_size=100):
+    def get_customer(self, customer_id):
+        """
+        Get a single customer by WooCommerce ID.
+        
+        Returns:
+            dict: The customer data, or None if it was not found
+        """
+        response = self.wcapi.get(f"customers/{customer_id}", params=self.fields_params('customers'))
+        if response.status_code == 404:
+            return None
+        if not response.ok:
+            raise Exception(f"Failed to get customer {customer_id}. Status code: {response.status_code}")
+        self._mark_healthy()
+        return response.json()
+
+    def find_customer_by_email(self, email, known_id=None):
+        """
+        Resolve one customer by email without exporting the whole store.
+        
+        Tries the exact `email` filter first, then a `search` query, and
+        finally the customer ID recorded locally by the last full sync.
+        
+        Args:
+            email (str): The email to look up (case-insensitive)
+            known_id (int): Optional WooCommerce customer ID from the local index
+            
+        Returns:
+            dict: The customer data, or None if no customer matches
+        """
+        key = email.strip().lower()
+        
+        def matching(customers):
+            for customer in customers:
+                if (customer.get('email') or '').lower() == key:
+                    return customer
+            return None
+        
+        for params in ({'email': key}, {'search': key}):
+            response = self.wcapi.get("customers", params={
+                **params,
+                'role': 'all',
+                'per_page': 10,
+                **self.fields_params('customers')
+            })
+            if not response.ok:
+                raise Exception(f"Failed to look up customer {email}. Status code: {response.status_code}")
+            self._mark_healthy()
+            customer = matching(response.json())
+            if customer:
+                return customer
+        
+        if known_id:
+            logger.info(f"Falling back to stored WooCommerce ID {known_id} for {email}")
+            customer = self.get_customer(known_id)
+            if customer and matching([customer]):
+                return customer
+        
+        return None
+
+    def find_customers_by_email(self, emails, known_ids=None, concurrency=None):
+        """
+        Resolve a batch of emails concurrently.
+        
+        Args:
+            emails (list): Emails to look up
+            known_ids (dict): Optional lowercased email -> WooCommerce ID index
+            concurrency (int): Parallel lookups (defaults to the client setting)
+            
+        Returns:
+            dict: Lowercased email -> customer data for every email that matched
+        """
+        known_ids = known_ids or {}
+        keys = list(dict.fromkeys(email.strip().lower() for email in emails if email))
+        if not keys:
+            return {}
+        
+        concurrency = min(concurrency or self.concurrency, len(keys))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = executor.map(lambda key: self.find_customer_by_email(key, known_ids.get(key)), keys)
+            return {key: customer for key, customer in zip(keys, results) if customer}
+
+    def iter_customers(self, batch_size=100, concurrency=None, prefetch=None):
+        """
+        Stream customers page by page.
+        
+        Yields each page result from get_customers ('data', 'total',
+        'total_pages', 'current_page') as soon as it arrives, while later pages
+        download in the background. Only a bounded number of pages is held in
+        memory at once.
+        
+        Args:
+            batch_size (int): Customers per page
+            concurrency (int): Parallel page downloads (defaults to the client setting)
+            prefetch (int): Maximum pages buffered ahead of the consumer
+        """
+        return self._iter_pages(self.get_customers, 'customers (including all roles)', batch_size, concurrency, prefetch)
+            
+    def get_all_customers(self, batch_size=100, concurrency=None):
         """
         Get all customers using pagination.
+        
+        Pages after the first are fetched in parallel when concurrency > 1.
+        Prefer iter_customers for large stores; this collects every page.
         """
         try:
-            first_page = self.get_customers(page=1, per_page=batch_size)
-            if not first_page or 'total' not in first_page:
-                logger.error("Failed to get initial customer data")
-                return []
-                
-            all_customers = first_page['data']
-            processed = len(all_customers)
-            logger.info(f"Processing page 1/{first_page['total_pages']} - {processed}/{first_page['total']} customers (including all roles)")
-            
-            # Process remaining pages
-            for page in range(2, first_page['total_pages'] + 1):
-                result = self.get_customers(page=page, per_page=batch_size)
-                if result and result.get('data'):
-                    all_customers.extend(result['data'])
-                    processed = len(all_customers)
-                    logger.info(f"Processing page {page}/{first_page['total_pages']} - {processed}/{first_page['total']} customers (including all roles)")
-                    
+            all_customers = []
+            for result in self.iter_customers(batch_size=batch_size, concurrency=concurrency):
+                all_customers.extend(result['data'])
             return all_customers
                     
         except Exception as e:
             logger.error(f"Error in get_all_customers: {str(e)}")
             return []
+
+
+_shared_api = None
+_shared_api_lock = threading.Lock()
+
+def get_woocommerce_api(check_connection=True):
+    """
+    Return the process-wide WooCommerceAPI client.
+
+    The client is created once per process and reused by every sync and admin
+    action so that its connection pool stays warm. The connection test runs
+    lazily, at most once per health check interval.
+    
+    Args:
+        check_connection (bool): Whether to run the lazy connection check
+        
+    Returns:
+        WooCommerceAPI: The shared client
+    """
+    global _shared_api
+    if _shared_api is None:
+        with _shared_api_lock:
+            if _shared_api is None:
+                _shared_api = WooCommerceAPI()
+    if check_connection:
+        _shared_api.ensure_connection()
+    return _shared_api
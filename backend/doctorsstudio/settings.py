@@ -41,7 +41,6 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'crm.middleware.TokenRefreshMiddleware',  # Add token refresh middleware
 ]
 
 ROOT_URLCONF = 'doctorsstudio.urls'
@@ -139,6 +138,115 @@ GOHIGHLEVEL_OAUTH = {
     'SCOPE': 'contacts.readonly contacts.write',
 }
 
+# Per-process OAuth token cache (crm.ghl_oauth.get_valid_token). Tokens are
+# reused until they near expiry, but re-read at least this often (seconds).
+GOHIGHLEVEL_TOKEN_CACHE = {
+    'TTL': int(os.getenv('GHL_TOKEN_CACHE_TTL', '300')),
+}
+
+# Background token refresher (`manage.py run_token_refresher`, also used by
+# `manage.py refresh_tokens`)
+TOKEN_REFRESH = {
+    'LEAD_TIME': int(os.getenv('TOKEN_REFRESH_LEAD_TIME', '900')),  # Refresh this many seconds before expiry
+    'CONCURRENCY': int(os.getenv('TOKEN_REFRESH_CONCURRENCY', '4')),  # Locations refreshed at once
+    'MAX_SLEEP': 3600,  # Longest sleep between checks, so new tokens are noticed
+    'RETRY_DELAY': 60,  # Seconds before retrying after a failed refresh
+    'CLAIM_TIMEOUT': 60,  # Seconds before another process may take over an unfinished refresh
+}
+
+# Location metadata (name, timezone, ...) cached on each OAuth2Token. The token
+# refresher re-fetches it once it is older than TTL seconds.
+GOHIGHLEVEL_LOCATION_METADATA = {
+    'TTL': int(os.getenv('GHL_LOCATION_METADATA_TTL', str(7 * 24 * 3600))),
+}
+
+# Retry policy for GoHighLevel API calls (see crm.retry.RetryPolicy)
+GOHIGHLEVEL_RETRY = {
+    'max_retries': 3,
+    'base_delay': 1,
+    'max_delay': 60,
+    'budget': 30,
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+
+# GoHighLevel contact sync pipeline
+GOHIGHLEVEL_SYNC = {
+    'PREFETCH_PAGES': int(os.getenv('GHL_PREFETCH_PAGES', '2')),  # Pages fetched ahead of the writer
+    # Walk contact search results with searchAfter cursors instead of page numbers
+    'CURSOR_PAGINATION': os.getenv('GHL_CURSOR_PAGINATION', 'true').lower() == 'true',
+    'MAX_LOCATIONS': int(os.getenv('GHL_SYNC_MAX_LOCATIONS', '4')),  # Locations synced concurrently by sync_ghl_locations
+}
+
+# Per-location GoHighLevel quota (crm.ghl_client). These are starting values;
+# the limiter follows the X-RateLimit-* headers GoHighLevel returns.
+GOHIGHLEVEL_RATE_LIMIT = {
+    'BURST': int(os.getenv('GHL_RATE_LIMIT_BURST', '100')),  # Requests per interval
+    'INTERVAL': float(os.getenv('GHL_RATE_LIMIT_INTERVAL', '10')),  # Seconds
+    'DAILY_WARNING': 5000,  # Log a warning when fewer daily requests than this remain
+}
+
+# WooCommerce client configuration
+WOOCOMMERCE = {
+    'POOL_SIZE': int(os.getenv('WOO_POOL_SIZE', '10')),
+    'HEALTH_CHECK_INTERVAL': int(os.getenv('WOO_HEALTH_CHECK_INTERVAL', '300')),
+    'CONCURRENCY': int(os.getenv('WOO_CONCURRENCY', '4')),
+    'PREFETCH_PAGES': int(os.getenv('WOO_PREFETCH_PAGES', '8')),  # Pages buffered ahead of the consumer
+    'RATE_LIMIT': float(os.getenv('WOO_RATE_LIMIT', '5')),  # Requests per second per store
+    # Request only the attributes the sync uses; set WOO_FULL_RAW=true to store complete payloads.
+    # Per-resource overrides of crm.woocommerce.DEFAULT_FIELDS go in 'FIELDS'.
+    'FULL_RAW': os.getenv('WOO_FULL_RAW', 'false').lower() == 'true',
+    'FIELDS': {},
+    # crm.retry.RetryPolicy options: backoff, Retry-After cap, retry budget and circuit breaker
+    'RETRY': {
+        'max_retries': 3,
+        'base_delay': 1,
+        'max_delay': 30,
+        'budget': 30,
+        'failure_threshold': 5,
+        'reset_timeout': 30,
+    },
+}
+
+# Background job queue (crm.jobs), executed by `manage.py run_workers`
+JOB_QUEUE = {
+    'WORKERS': int(os.getenv('JOB_WORKERS', '2')),
+    'POLL_INTERVAL': float(os.getenv('JOB_POLL_INTERVAL', '2')),  # Seconds an idle worker waits between claims
+    'HEARTBEAT_INTERVAL': int(os.getenv('JOB_HEARTBEAT_INTERVAL', '30')),  # Seconds between a running job's heartbeats
+    'STALE_AFTER': int(os.getenv('JOB_STALE_AFTER', '300')),  # Seconds without a heartbeat before a running job is requeued
+    'RETRY_DELAY': 60,  # Seconds before a failed job is retried (doubles per attempt)
+}
+
+# Appointment webhook queue (crm.webhooks), drained by `manage.py process_webhooks`.
+# The webhook endpoint only stores the payload; processing happens there.
+WEBHOOK_QUEUE = {
+    'BATCH_SIZE': int(os.getenv('WEBHOOK_BATCH_SIZE', '50')),  # Webhooks claimed at once
+    'WORKERS': int(os.getenv('WEBHOOK_WORKERS', '4')),  # Webhooks processed concurrently
+    'POLL_INTERVAL': float(os.getenv('WEBHOOK_POLL_INTERVAL', '1')),  # Seconds between checks of an empty queue
+    'STALE_AFTER': int(os.getenv('WEBHOOK_STALE_AFTER', '300')),  # Seconds before a claimed webhook is assumed abandoned
+}
+
+# Shared sync progress (crm.progress): how often a running sync may write
+# its counters and re-read its stop flag, in seconds
+SYNC_PROGRESS = {
+    'WRITE_INTERVAL': float(os.getenv('SYNC_PROGRESS_WRITE_INTERVAL', '0.5')),
+    'STOP_CHECK_INTERVAL': float(os.getenv('SYNC_PROGRESS_STOP_CHECK_INTERVAL', '1')),
+}
+
+# Phone normalization (crm.identity.normalize_phone): country code assumed
+# for numbers written without one, and the length of such national numbers
+PHONE_NORMALIZATION = {
+    'DEFAULT_COUNTRY_CODE': os.getenv('PHONE_DEFAULT_COUNTRY_CODE', '1'),
+    'NATIONAL_NUMBER_LENGTH': int(os.getenv('PHONE_NATIONAL_NUMBER_LENGTH', '10')),
+}
+
+# In-memory contact identity index (crm.identity) shared by syncs and webhooks.
+# It refreshes incrementally on each use and fully reloads after this many
+# seconds to drop deleted contacts.
+CONTACT_IDENTITY_INDEX = {
+    'FULL_RELOAD_INTERVAL': int(os.getenv('CONTACT_INDEX_RELOAD_INTERVAL', '600')),
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,